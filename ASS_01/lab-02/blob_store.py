@@ -0,0 +1,136 @@
+import hashlib
+import mmap
+import os
+from typing import Dict, Optional, Tuple, Union
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Object id git gives this content (`git hash-object`)."""
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+class BlobStore:
+    """Append-only, content-addressed store of source file versions.
+
+    Every distinct file version is stored once in `<root>/blobs.pack`, keyed by
+    its git blob SHA; `<root>/blobs.idx` maps each SHA to its offset and length
+    in the pack. Reads go through an mmap of the pack, so looking a version up
+    costs a slice, not a file read. `get` decodes as pydriller does (UTF-8,
+    undecodable bytes dropped). The empty file is never stored: its reference
+    is the empty string.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.pack_path = os.path.join(root, "blobs.pack")
+        self.index_path = os.path.join(root, "blobs.idx")
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._pack = None
+        self._idx = None
+        self._map: Optional[mmap.mmap] = None
+        self.hits = 0
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        with open(self.index_path, encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 3 or not (parts[1].isdigit() and parts[2].isdigit()):
+                    break
+                offset, length = int(parts[1]), int(parts[2])
+                # Entries whose bytes never made it to disk are dropped
+                if offset + length > pack_size:
+                    break
+                self._index[parts[0]] = (offset, length)
+
+    def __contains__(self, sha: str) -> bool:
+        return sha in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _open_for_append(self):
+        os.makedirs(self.root, exist_ok=True)
+        end = max((off + ln for off, ln in self._index.values()), default=0)
+        self._pack = open(self.pack_path, "a+b")
+        # Drop bytes appended after the last indexed blob (crash mid-write)
+        self._pack.truncate(end)
+        self._pack.seek(end)
+        # Rewrite the index so it only holds the entries we kept
+        with open(self.index_path, "w", encoding="utf-8") as fh:
+            for sha, (off, ln) in self._index.items():
+                fh.write(f"{sha}\t{off}\t{ln}\n")
+        self._idx = open(self.index_path, "a", encoding="utf-8")
+
+    def put(self, text: Union[str, bytes, None], sha: Optional[str] = None) -> str:
+        """Store `text` (if new) and return its reference.
+
+        Pass `sha` when git already told us the blob id, together with the raw
+        blob bytes so the stored content is exactly the object the SHA names;
+        `text` may be None for a blob the store is known to hold. Text without
+        a SHA is keyed by the blob SHA of its UTF-8 encoding.
+        """
+        if sha is not None and sha in self._index:
+            self.hits += 1
+            return sha
+        if not text:
+            return ""
+        if isinstance(text, str):
+            if sha is not None:
+                raise ValueError("pass the raw blob bytes with a git SHA, not decoded text")
+            data = text.encode("utf-8", errors="surrogateescape")
+        else:
+            data = bytes(text)
+        sha = sha or git_blob_sha(data)
+        if sha in self._index:
+            self.hits += 1
+            return sha
+        if self._pack is None:
+            self._open_for_append()
+        offset = self._pack.tell()
+        self._pack.write(data)
+        self._idx.write(f"{sha}\t{offset}\t{len(data)}\n")
+        self._index[sha] = (offset, len(data))
+        return sha
+
+    def sync(self):
+        """Make every blob put so far durable; call before writing rows that reference them."""
+        if self._pack is None:
+            return
+        self._pack.flush()
+        os.fsync(self._pack.fileno())
+        self._idx.flush()
+        os.fsync(self._idx.fileno())
+
+    def get(self, sha: str) -> str:
+        if not isinstance(sha, str) or not sha:
+            return ""
+        offset, length = self._index[sha]
+        if self._map is None or offset + length > len(self._map):
+            if self._pack is not None:
+                self._pack.flush()
+            if self._map is not None:
+                self._map.close()
+            with open(self.pack_path, "rb") as fh:
+                self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length].decode("utf-8", errors="ignore")
+
+    def close(self):
+        self.sync()
+        if self._pack is not None:
+            self._pack.close()
+            self._idx.close()
+            self._pack = self._idx = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,177 @@
+import csv
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Set
+
+
+class _ChunkedWriter(ABC):
+    """Buffer rows per commit and write them out in bounded chunks, resumably.
+
+    After every flush the flushed commit hashes are appended to
+    `<path>.progress`, each with a position token saying how much output is
+    durable at that point. On restart the output is rolled back to the last
+    recorded token (dropping anything half-written) and the recorded hashes are
+    reported in `done_hashes`. Subclasses decide what the token means.
+    `before_flush` runs ahead of every chunk write, e.g. to make data the rows
+    refer to durable first.
+    """
+
+    def __init__(self, path: str, columns: List[str], chunk_rows: int = 200, resume: bool = True,
+                 before_flush: Optional[Callable[[], None]] = None):
+        self.path = path
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self.before_flush = before_flush
+        self.progress_path = path.rstrip("/") + ".progress"
+        self.done_hashes: Set[str] = set()
+        self._buffer: List[Dict[str, str]] = []
+        self._pending_hashes: List[str] = []
+        self.rows_written = 0
+
+        token = self._load_progress() if resume else None
+        if token is not None and not self._token_valid(token):
+            # Output no longer holds what the log records (e.g. replaced or cut short): start over
+            token = None
+        if token is None:
+            self.done_hashes.clear()
+            open(self.progress_path, "w").close()
+        self._open(token)
+
+    def _load_progress(self):
+        """Return the last durable position token, or None if there is nothing to resume."""
+        if not (os.path.exists(self.path) and os.path.exists(self.progress_path)):
+            return None
+        token = None
+        with open(self.progress_path, encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                # A torn last line (crash mid-append) simply fails to parse
+                if len(parts) != 2 or not parts[1].isdigit():
+                    break
+                self.done_hashes.add(parts[0])
+                token = int(parts[1])
+        return token
+
+    def _token_valid(self, token) -> bool:
+        """Whether the output on disk still reaches the recorded position."""
+        return True
+
+    @abstractmethod
+    def _open(self, token):
+        """Open the output, rolled back to `token` (None = start empty)."""
+
+    @abstractmethod
+    def _write_chunk(self, rows: List[Dict[str, str]]) -> int:
+        """Write `rows` durably and return the new position token."""
+
+    def _close(self):
+        pass
+
+    def add_commit(self, commit_hash: str, rows: List[Dict[str, str]]):
+        """Queue all rows of one commit; a commit is never split across chunks."""
+        self._buffer.extend(rows)
+        self._pending_hashes.append(commit_hash)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending_hashes:
+            return
+        if self.before_flush is not None:
+            self.before_flush()
+        token = self._write_chunk(self._buffer)
+        with open(self.progress_path, "a", encoding="utf-8") as fh:
+            for h in self._pending_hashes:
+                fh.write(f"{h}\t{token}\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        self.rows_written += len(self._buffer)
+        self.done_hashes.update(self._pending_hashes)
+        self._buffer = []
+        self._pending_hashes = []
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Flush what we have even on error, so a rerun resumes after it
+        self.close()
+
+
+class ChunkedCsvWriter(_ChunkedWriter):
+    """Single CSV file; the progress token is the fsync'ed file size."""
+
+    def _token_valid(self, token):
+        return token <= os.path.getsize(self.path)
+
+    def _open(self, token):
+        if token is None:
+            self._file = open(self.path, mode="w", newline="", encoding="utf-8")
+        else:
+            self._file = open(self.path, mode="r+", newline="", encoding="utf-8")
+            self._file.truncate(token)
+            self._file.seek(token)
+        self._writer = csv.writer(self._file, quoting=csv.QUOTE_ALL, escapechar="\\")
+        if self._file.tell() == 0:
+            self._writer.writerow(self.columns)
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_chunk(self, rows):
+        for row in rows:
+            self._writer.writerow([row.get(col, "") for col in self.columns])
+        self._sync()
+        return self._file.tell()
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetDatasetWriter(_ChunkedWriter):
+    """Directory of `part-NNNNN.parquet` files, one per chunk; the token is the part count.
+
+    All columns are stored as strings, so readers can project just the columns
+    they need (`pd.read_parquet(path, columns=[...])`) without touching the
+    source/diff blobs.
+    """
+
+    def _token_valid(self, token):
+        return all(os.path.exists(os.path.join(self.path, f"part-{i:05d}.parquet")) for i in range(token))
+
+    def _open(self, token):
+        import pyarrow as pa
+
+        self._schema = pa.schema([(col, pa.string()) for col in self.columns])
+        os.makedirs(self.path, exist_ok=True)
+        self._parts = token or 0
+        # Parts beyond the last recorded one were written but never acknowledged
+        for name in os.listdir(self.path):
+            if name.startswith("part-") and name.endswith(".parquet"):
+                if int(name[len("part-"):-len(".parquet")]) >= self._parts:
+                    os.remove(os.path.join(self.path, name))
+            elif name.startswith(".part-") and name.endswith(".tmp"):
+                os.remove(os.path.join(self.path, name))
+
+    def _write_chunk(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(
+            {col: [row.get(col, "") for row in rows] for col in self.columns},
+            schema=self._schema,
+        )
+        name = f"part-{self._parts:05d}.parquet"
+        final = os.path.join(self.path, name)
+        # Dot-prefixed so dataset readers never pick up a half-written part
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, final)
+        self._parts += 1
+        return self._parts
@@ -0,0 +1,90 @@
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from blob_store import BlobStore
+
+# ----------------------------
+# Shared reader for the bugfix_commits_with_llm corpus.
+# Prefers the Parquet dataset written by llm.py and falls back to the CSV.
+# Source columns stored as blob references are resolved through the blob store.
+# ----------------------------
+CSV_PATH = "bugfix_commits_with_llm.csv"
+DATASET_DIR = "bugfix_commits_with_llm.parquet"
+BLOB_STORE_DIR = "source_blobs"
+
+KEY_COLUMNS = ["Hash", "Message", "Filename"]
+SOURCE_COLUMNS = ["Source Code (before)", "Source Code (current)"]
+# Column holding the git blob SHA of each source column when llm.py ran with a blob store
+BLOB_COLUMNS = {
+    "Source Code (before)": "Source Blob (before)",
+    "Source Code (current)": "Source Blob (current)",
+}
+
+
+def _csv_columns(columns: List[str]):
+    wanted = set(columns)
+    return lambda c: c.strip() in wanted
+
+
+def _available_columns(csv_path: str, dataset_dir: str) -> List[str]:
+    if os.path.isdir(dataset_dir):
+        import pyarrow.dataset as ds
+
+        return ds.dataset(dataset_dir, format="parquet").schema.names
+    return [c.strip() for c in pd.read_csv(csv_path, nrows=0).columns]
+
+
+def _physical_columns(columns: List[str], available: List[str]) -> List[str]:
+    """Swap any source column that is not stored inline for its blob reference column."""
+    physical = []
+    for col in columns:
+        if col not in available and BLOB_COLUMNS.get(col) in available:
+            col = BLOB_COLUMNS[col]
+        if col not in physical:
+            physical.append(col)
+    return physical
+
+
+def _resolve(df: pd.DataFrame, columns: List[str], store: Optional[BlobStore]) -> pd.DataFrame:
+    for col in columns:
+        if col not in df.columns and BLOB_COLUMNS.get(col) in df.columns:
+            df[col] = df[BLOB_COLUMNS[col]].map(store.get)
+    return df[columns]
+
+
+def load_corpus(columns: List[str], csv_path: str = CSV_PATH, dataset_dir: str = DATASET_DIR,
+                limit: Optional[int] = None, blob_dir: str = BLOB_STORE_DIR) -> pd.DataFrame:
+    """Load only `columns` (and at most `limit` rows) of the corpus; nothing else is read from disk."""
+    physical = _physical_columns(columns, _available_columns(csv_path, dataset_dir))
+    if os.path.isdir(dataset_dir):
+        if limit is None:
+            df = pd.read_parquet(dataset_dir, columns=physical)
+        else:
+            import pyarrow.dataset as ds
+
+            df = ds.dataset(dataset_dir, format="parquet").head(limit, columns=physical).to_pandas()
+    else:
+        df = pd.read_csv(csv_path, usecols=_csv_columns(physical), escapechar="\\", nrows=limit)
+        df.columns = df.columns.str.strip()
+    store = BlobStore(blob_dir) if physical != columns else None
+    return _resolve(df, columns, store)
+
+
+def iter_corpus(columns: List[str], batch_rows: int = 1000, csv_path: str = CSV_PATH,
+                dataset_dir: str = DATASET_DIR, blob_dir: str = BLOB_STORE_DIR) -> Iterator[pd.DataFrame]:
+    """Yield the corpus `batch_rows` rows at a time, so big text columns are never all in memory."""
+    physical = _physical_columns(columns, _available_columns(csv_path, dataset_dir))
+    store = BlobStore(blob_dir) if physical != columns else None
+    if os.path.isdir(dataset_dir):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(dataset_dir, format="parquet")
+        for batch in dataset.to_batches(columns=physical, batch_size=batch_rows):
+            if batch.num_rows:
+                yield _resolve(batch.to_pandas(), columns, store)
+        return
+    for chunk in pd.read_csv(csv_path, usecols=_csv_columns(physical), escapechar="\\", chunksize=batch_rows):
+        chunk.columns = chunk.columns.str.strip()
+        yield _resolve(chunk, columns, store)
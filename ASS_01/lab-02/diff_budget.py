@@ -0,0 +1,56 @@
+import re
+from typing import List
+
+from diff_parser import Hunk, parse_diff
+
+# Changed lines that mention control flow / error handling carry most of a fix's meaning
+CONTROL_RE = re.compile(
+    r"\b(if|else|elif|for|while|switch|case|try|except|catch|finally|return|raise|throw|null|none|assert)\b"
+)
+CONTROL_WEIGHT = 3
+
+
+def render_hunk(hunk: Hunk) -> str:
+    """Compact hunk text for the model: header plus changed lines (context is dropped)."""
+    out = [f"@@ {hunk.header}" if hunk.header else "@@"]
+    out.extend(f"{ln.kind}{ln.text.strip()}" for ln in hunk.lines if ln.kind != " ")
+    return "\n".join(out)
+
+
+def hunk_score(hunk: Hunk) -> int:
+    changed = [ln.text for ln in hunk.lines if ln.kind != " "]
+    control = sum(len(CONTROL_RE.findall(t.lower())) for t in changed)
+    return len(changed) + CONTROL_WEIGHT * control
+
+
+def pack_diff_ids(tokenizer, diff_text: str, budget: int) -> List[int]:
+    """Token ids of the highest-signal hunks that fit in `budget` tokens, in diff order.
+
+    Every hunk is tokenized once (one batched tokenizer call) and the selected
+    hunks' ids are concatenated directly, so nothing is re-tokenized. Hunks are
+    taken best-score first; a hunk that does not fit is skipped in favour of
+    smaller ones, except that the best hunk is cut to fit when it alone is too big.
+    """
+    if budget <= 0 or not diff_text:
+        return []
+    hunks = parse_diff(diff_text).hunks
+    if not hunks:
+        # Sliced rather than truncation=True, which would reconfigure a tokenizer other threads may be using
+        return tokenizer(diff_text, add_special_tokens=False)["input_ids"][:budget]
+
+    texts = [render_hunk(h) for h in hunks]
+    ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    order = sorted(range(len(hunks)), key=lambda i: (-hunk_score(hunks[i]), i))
+
+    chosen = {}
+    left = budget
+    for i in order:
+        if len(ids[i]) <= left:
+            chosen[i] = ids[i]
+            left -= len(ids[i])
+        elif not chosen:
+            chosen[i] = ids[i][:left]
+            left = 0
+        if left == 0:
+            break
+    return [tok for i in sorted(chosen) for tok in chosen[i]]
@@ -0,0 +1,136 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Union
+
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+DEF_RE = re.compile(r"\bdef\s+([A-Za-z_]\w*)")
+# Generic "name(" in a hunk header, for languages without `def` (C#, C++, Java, ...)
+CALL_RE = re.compile(r"([A-Za-z_]\w*)\s*\(")
+NOT_FUNCTIONS = {"if", "for", "while", "switch", "catch", "return", "using", "lock", "foreach", "elif", "with"}
+
+
+@dataclass
+class DiffLine:
+    kind: str                  # "+", "-" or " "
+    text: str                  # line content without the leading marker
+    old_no: Optional[int]      # line number in the old file (None for added lines)
+    new_no: Optional[int]      # line number in the new file (None for removed lines)
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_len: int
+    new_start: int
+    new_len: int
+    header: str                # text after the closing @@ (git's enclosing-function context)
+    lines: List[DiffLine] = field(default_factory=list)
+
+    @property
+    def function(self) -> Optional[str]:
+        """Name of the function git reported as enclosing this hunk, if any."""
+        m = DEF_RE.search(self.header)
+        if m:
+            return m.group(1)
+        names = [n for n in CALL_RE.findall(self.header) if n not in NOT_FUNCTIONS]
+        return names[-1] if names else None
+
+    @property
+    def added(self) -> List[DiffLine]:
+        return [ln for ln in self.lines if ln.kind == "+"]
+
+    @property
+    def removed(self) -> List[DiffLine]:
+        return [ln for ln in self.lines if ln.kind == "-"]
+
+
+@dataclass
+class ParsedDiff:
+    hunks: List[Hunk] = field(default_factory=list)
+
+    @property
+    def added(self) -> List[DiffLine]:
+        return [ln for h in self.hunks for ln in h.lines if ln.kind == "+"]
+
+    @property
+    def removed(self) -> List[DiffLine]:
+        return [ln for h in self.hunks for ln in h.lines if ln.kind == "-"]
+
+    def changed_new_lines(self) -> List[int]:
+        """New-file line numbers touched by the diff (a pure deletion marks the line it sits before)."""
+        out = []
+        for h in self.hunks:
+            pos = max(h.new_start, 1)
+            for ln in h.lines:
+                if ln.kind == "-":
+                    out.append(pos)
+                    continue
+                if ln.kind == "+":
+                    out.append(ln.new_no)
+                pos = ln.new_no + 1
+        return out
+
+    def changed_old_lines(self) -> List[int]:
+        """Old-file line numbers touched by the diff (a pure addition marks the line it sits before)."""
+        out = []
+        for h in self.hunks:
+            pos = max(h.old_start, 1)
+            replacing = False  # added lines right after removed ones replace them; nothing extra to mark
+            for ln in h.lines:
+                if ln.kind == "+":
+                    if not replacing:
+                        out.append(pos)
+                    continue
+                if ln.kind == "-":
+                    out.append(ln.old_no)
+                replacing = ln.kind == "-"
+                pos = ln.old_no + 1
+        return out
+
+    def __bool__(self) -> bool:
+        return bool(self.hunks)
+
+
+def parse_diff(diff: Union[str, Iterable[str]]) -> ParsedDiff:
+    """Parse a unified diff (pydriller's `mod.diff`) in one pass into hunks with line numbers.
+
+    Anything outside a hunk (`diff --git`, `---`/`+++` headers, binary notices) is
+    skipped; `\\ No newline at end of file` markers are ignored.
+    """
+    lines = diff.splitlines() if isinstance(diff, str) else diff
+    parsed = ParsedDiff()
+    hunk = None
+    old_no = new_no = 0
+    old_left = new_left = 0
+    for raw in lines:
+        if old_left <= 0 and new_left <= 0:
+            m = HUNK_RE.match(raw)
+            if not m:
+                continue
+            old_start, new_start = int(m.group(1)), int(m.group(3))
+            old_len = int(m.group(2)) if m.group(2) is not None else 1
+            new_len = int(m.group(4)) if m.group(4) is not None else 1
+            hunk = Hunk(old_start, old_len, new_start, new_len, m.group(5).strip())
+            parsed.hunks.append(hunk)
+            old_no, new_no = old_start, new_start
+            old_left, new_left = old_len, new_len
+            continue
+        marker, text = raw[:1], raw[1:]
+        if marker == "+":
+            hunk.lines.append(DiffLine("+", text, None, new_no))
+            new_no += 1
+            new_left -= 1
+        elif marker == "-":
+            hunk.lines.append(DiffLine("-", text, old_no, None))
+            old_no += 1
+            old_left -= 1
+        elif marker == "\\":
+            continue
+        else:
+            # Context line (an empty line in the diff is an empty context line)
+            hunk.lines.append(DiffLine(" ", text, old_no, new_no))
+            old_no += 1
+            new_no += 1
+            old_left -= 1
+            new_left -= 1
+    return parsed
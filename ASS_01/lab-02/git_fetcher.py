@@ -0,0 +1,75 @@
+import subprocess
+from collections import OrderedDict
+from typing import Optional
+
+
+class CatFileFetcher:
+    """Read blobs from a local repository through persistent `git cat-file` processes.
+
+    `resolve("<rev>:<path>")` turns a tree path into a blob SHA via
+    `git cat-file --batch-check`, and `read(sha)` streams the blob's contents
+    through `git cat-file --batch`. Both processes live as long as the fetcher,
+    so there is no per-object process or object-database setup cost. Recently
+    read blobs are kept in an LRU bounded by `cache_bytes`; one commit's "after"
+    version is usually a later commit's "before" version.
+    """
+
+    def __init__(self, repo_path: str, cache_bytes: int = 256 * 1024 * 1024):
+        self.repo_path = repo_path
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached = 0
+        self.hits = 0
+        self.misses = 0
+        self._check = self._spawn("--batch-check")
+        self._batch = self._spawn("--batch")
+
+    def _spawn(self, mode: str):
+        return subprocess.Popen(["git", "-C", self.repo_path, "cat-file", mode],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def resolve(self, spec: str) -> Optional[str]:
+        """Blob SHA for `<rev>:<path>`, or None when the path does not exist there."""
+        self._check.stdin.write(spec.encode("utf-8") + b"\n")
+        self._check.stdin.flush()
+        header = self._check.stdout.readline().decode("utf-8", "replace").split()
+        if len(header) != 3 or header[1] != "blob":
+            return None
+        return header[0]
+
+    def read(self, sha: str) -> bytes:
+        if sha in self._cache:
+            self._cache.move_to_end(sha)
+            self.hits += 1
+            return self._cache[sha]
+        self.misses += 1
+        self._batch.stdin.write(sha.encode("ascii") + b"\n")
+        self._batch.stdin.flush()
+        header = self._batch.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(f"git cat-file: {sha} missing")
+        size = int(header[2])
+        data = self._batch.stdout.read(size)
+        self._batch.stdout.read(1)  # trailing newline after the contents
+        if size <= self.cache_bytes:
+            self._cache[sha] = data
+            self._cached += size
+            while self._cached > self.cache_bytes:
+                _, old = self._cache.popitem(last=False)
+                self._cached -= len(old)
+        return data
+
+    def text(self, sha: Optional[str]) -> str:
+        # Same decoding pydriller applies to source_code / source_code_before
+        return self.read(sha).decode("utf-8", "ignore") if sha else ""
+
+    def close(self):
+        for proc in (self._check, self._batch):
+            proc.stdin.close()
+            proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,7 +1,30 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from corpus import load_corpus
 
 INPUT_CSV = "bugfix_commits_with_llm.csv"   
+INPUT_DATASET = "bugfix_commits_with_llm.parquet"  # used instead of the CSV when present
+# is_precise never looks at the diff or sources, so they are not loaded
+COLUMNS = ["Message", "Filename", "LLM Inference (fix type)", "Rectified Message"]
+
+DIFF_KEYWORDS = ["null", "check", "log", "return", "assert", "exception", "import"]
+
+# Message kinds scored together (prefix of the result columns)
+MESSAGE_COLUMNS = {
+    "Dev": "Message",
+    "LLM": "LLM Inference (fix type)",
+    "Rect": "Rectified Message",
+}
+
+# Heuristic variants scored in the same pass; "default" is exactly is_precise
+HEURISTICS = {
+    "default": {"min_words": 3, "keywords": DIFF_KEYWORDS, "filename": True},
+    "keywords_only": {"min_words": 3, "keywords": DIFF_KEYWORDS, "filename": False},
+    "filename_only": {"min_words": 3, "keywords": [], "filename": True},
+    "strict": {"min_words": 5, "keywords": DIFF_KEYWORDS, "filename": True},
+}
+
 def is_precise(msg: str, diff: str, filename: str) -> bool:
     if not isinstance(msg, str) or not msg.strip():
         return False
@@ -11,17 +34,61 @@ def is_precise(msg: str, diff: str, filename: str) -> bool:
     fname = (filename or "").lower()
     if any(token in msg.lower() for token in fname.replace("/", " ").split()):
         return True
-    diff_keywords = ["null", "check", "log", "return", "assert", "exception", "import"]
-    if any(kw in msg.lower() for kw in diff_keywords):
+    if any(kw in msg.lower() for kw in DIFF_KEYWORDS):
         return True
     return False
 
+def score_precision(df: pd.DataFrame, message_cols: dict = MESSAGE_COLUMNS,
+                    heuristics: dict = HEURISTICS) -> pd.DataFrame:
+    """Vectorized is_precise for every (heuristic, message kind) pair, e.g. column `default/Dev`."""
+    n = len(df)
+    kinds = list(message_cols)
+
+    # Stack all message kinds into one long Series so each feature is computed once
+    stacked = pd.concat([df[c] for c in message_cols.values()], ignore_index=True)
+    valid = stacked.notna().to_numpy()
+    msgs = stacked.fillna("").astype(str).str.lower()
+    n_words = msgs.str.count(r"\S+").to_numpy()
+
+    # Filename tokens are exploded once (row position -> token) and matched against
+    # the same row of every message kind; plain `in` on object arrays, so no row is
+    # padded to the longest message as a fixed-width numpy string array would be
+    fname_hit = np.zeros(len(stacked), dtype=bool)
+    if any(h["filename"] for h in heuristics.values()):
+        tokens = (df["Filename"].reset_index(drop=True).fillna("").astype(str).str.lower()
+                  .str.replace("/", " ", regex=False).str.split().explode().dropna())
+        if len(tokens):
+            tok_rows = tokens.index.to_numpy()
+            rows = np.concatenate([tok_rows + k * n for k in range(len(kinds))])
+            toks = np.tile(tokens.to_numpy(dtype=object), len(kinds))
+            msg_arr = msgs.to_numpy(dtype=object)
+            hit = np.fromiter((tok in msg for msg, tok in zip(msg_arr[rows], toks)), dtype=bool, count=len(rows))
+            np.logical_or.at(fname_hit, rows, hit)
+
+    # One substring scan per distinct keyword, shared by every heuristic that uses it
+    keyword_hit = {}
+    for h in heuristics.values():
+        for kw in h["keywords"]:
+            if kw not in keyword_hit:
+                keyword_hit[kw] = msgs.str.contains(kw, regex=False).to_numpy()
+
+    out = {}
+    for name, h in heuristics.items():
+        hit = fname_hit.copy() if h["filename"] else np.zeros(len(stacked), dtype=bool)
+        for kw in h["keywords"]:
+            hit |= keyword_hit[kw]
+        precise = (valid & (n_words >= h["min_words"]) & hit).reshape(len(kinds), n)
+        for k, kind in enumerate(kinds):
+            out[f"{name}/{kind}"] = precise[k]
+    return pd.DataFrame(out, index=df.index)
+
 def main():
-    df = pd.read_csv(INPUT_CSV)
+    df = load_corpus(COLUMNS, csv_path=INPUT_CSV, dataset_dir=INPUT_DATASET)
 
-    df["DevPrecise"]  = df.apply(lambda r: is_precise(r["Message"], r["Diff"], r["Filename"]), axis=1)
-    df["LLMPrecise"]  = df.apply(lambda r: is_precise(r["LLM Inference (fix type)"], r["Diff"], r["Filename"]), axis=1)
-    df["RectPrecise"] = df.apply(lambda r: is_precise(r["Rectified Message"], r["Diff"], r["Filename"]), axis=1)
+    scores = score_precision(df)
+    df["DevPrecise"]  = scores["default/Dev"]
+    df["LLMPrecise"]  = scores["default/LLM"]
+    df["RectPrecise"] = scores["default/Rect"]
 
     rq1 = df["DevPrecise"].mean()
     rq2 = df["LLMPrecise"].mean()
@@ -31,6 +98,12 @@ def main():
     print("RQ2 (LLM hit rate):", rq2)
     print("RQ3 (Rectifier hit rate):", rq3)
 
+    # Hit rate of every heuristic variant (rows) per message kind (columns)
+    rates = scores.mean()
+    rates.index = pd.MultiIndex.from_tuples([c.split("/") for c in rates.index])
+    print("\nHit rate by heuristic variant:")
+    print(rates.unstack()[list(MESSAGE_COLUMNS)].to_string())
+
     # Plot
     scores = [rq1, rq2, rq3]
     labels = ["RQ1: Developer", "RQ2: LLM", "RQ3: Rectifier"]
@@ -1,147 +1,337 @@
+import functools
+import queue
+import re
+import threading
+import time
 import pandas as pd
 from pydriller import Repository
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import torch
-import csv
 from tqdm import tqdm
+from chunked_writer import ChunkedCsvWriter, ParquetDatasetWriter
+from blob_store import BlobStore
+from corpus import BLOB_COLUMNS
+from diff_parser import DEF_RE, ParsedDiff, parse_diff
+from model_server import connect
+from diff_budget import pack_diff_ids
+from git_fetcher import CatFileFetcher
 
 
 REPO_PATH = "/home/set-iitgn-vm/Desktop/STT_lab_02/notepads"  # local clone of the repo
 INPUT_CSV = "/home/set-iitgn-vm/Desktop/STT_lab_02/bugfix_commits.csv"
 OUTPUT_CSV = "bugfix_commits_with_llm.csv"
+OUTPUT_DATASET = "bugfix_commits_with_llm.parquet"  # directory of part-*.parquet files
+OUTPUT_FORMAT = "parquet"  # "parquet" (column-projectable dataset) or "csv"
 MODEL_NAME = "mamiksik/CommitPredictorT5"
-MAX_DIFF_CHARS = 500  # used ONLY for LLM input; full diff is still saved
+MODEL_SOCKET = "/tmp/stt_models.sock"  # model_server.py socket; used automatically when it exists
+MAX_INPUT_TOKENS = 512  # model input budget; full diff is still saved
+MAX_MSG_TOKENS = 128    # cap on the commit-message part, the rest goes to diff hunks
+DIFF_TRUNCATION = "budget"  # "budget": rank hunks and pack them into the token budget; "chars": old prefix cut
+MAX_DIFF_CHARS = 500  # only used with DIFF_TRUNCATION = "chars"
+CHUNK_ROWS = 200      # rows buffered in memory before a flush (~ rows per Parquet part file)
+RESUME = True         # pick up after the last flushed commit if a previous run stopped early
+BLOB_STORE_DIR = "source_blobs"  # sources stored once by git blob SHA; None = inline full sources in every row
+PIPELINE = True       # overlap git traversal with LLM inference (False = one commit at a time)
+INFERENCE_WORKERS = 2 # threads draining the commit queue through the model
+QUEUE_SIZE = 8        # materialized commits allowed to wait for inference (bounds memory)
+USE_CAT_FILE = True   # read sources through a persistent `git cat-file --batch` (False = pydriller)
+BLOB_CACHE_MB = 256   # LRU of recently read blobs inside the cat-file fetcher
 
-print(f"Loading model {MODEL_NAME}...")
+OUTPUT_COLUMNS = [
+    "Hash",
+    "Message",
+    "Filename",
+    "Source Code (before)",
+    "Source Code (current)",
+    "Diff",
+    "LLM Inference (fix type)",
+    "Rectified Message"
+]
+
+# The tokenizer is cheap and always local (the budget packer needs it);
+# the model comes from the resident server when one is running (see model_server.py)
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-
-
-def run_llm_inference(commit_msg: str, combined_diff_for_commit: str) -> str:
-    # Keep LLM input compact for speed; output is a short “fix type” phrase
-    short_diff = (combined_diff_for_commit or "")[:MAX_DIFF_CHARS]
-    input_text = f"Commit message: {commit_msg}\nDiff: {short_diff}"
-    inputs = tokenizer(
-        input_text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512
-    ).to(device)
+model_client = connect(MODEL_SOCKET)
+if model_client is not None:
+    print(f"Using model server at {MODEL_SOCKET} for {MODEL_NAME}")
+else:
+    print(f"Loading model {MODEL_NAME}...")
+    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = model.to(device)
+
+
+def build_input_ids(commit_msg: str, combined_diff_for_commit: str) -> list:
+    """Message plus the best-signal hunks, packed into exactly MAX_INPUT_TOKENS tokens."""
+    limit = MAX_INPUT_TOKENS - tokenizer.num_special_tokens_to_add()
+    # Only the message is capped; the "Diff:" label always follows it, so packed hunks stay labelled
+    label = tokenizer("\nDiff: ", add_special_tokens=False)["input_ids"]
+    message = tokenizer(f"Commit message: {commit_msg}", add_special_tokens=False)["input_ids"]
+    prefix = message[:max(0, min(MAX_MSG_TOKENS, limit - len(label)))] + label
+    ids = prefix + pack_diff_ids(tokenizer, combined_diff_for_commit or "", limit - len(prefix))
+    return tokenizer.build_inputs_with_special_tokens(ids)
+
+
+def encode_commit(commit_msg: str, combined_diff_for_commit: str) -> list:
+    """Model input ids for one commit.
+
+    Runs in the traversal thread only. No call changes the tokenizer's
+    truncation settings (ids are sliced instead), since the fast tokenizer is
+    shared with the inference threads and must not be reconfigured under them.
+    """
+    if DIFF_TRUNCATION == "chars":
+        # Old behaviour: first MAX_DIFF_CHARS characters, whatever they are
+        short_diff = (combined_diff_for_commit or "")[:MAX_DIFF_CHARS]
+        ids = tokenizer(f"Commit message: {commit_msg}\nDiff: {short_diff}", add_special_tokens=False)["input_ids"]
+        return tokenizer.build_inputs_with_special_tokens(ids[:MAX_INPUT_TOKENS - tokenizer.num_special_tokens_to_add()])
+    return build_input_ids(commit_msg, combined_diff_for_commit)
+
+
+def run_llm_inference(input_ids: list) -> str:
+    # Output is a short “fix type” phrase
+    if model_client is not None:
+        return model_client.generate_ids(MODEL_NAME, [input_ids], max_length=64)[0]
+    inputs = torch.tensor([input_ids], device=device)
     with torch.no_grad():
-        outputs = model.generate(**inputs, max_length=64)
+        outputs = model.generate(input_ids=inputs, attention_mask=torch.ones_like(inputs), max_length=64)
     return tokenizer.decode(outputs[0], skip_special_tokens=True)
 
 
-def extract_action(diff_text: str) -> str:
-    if not diff_text:
+NULL_MARKERS = ("is not none", "!= none", "null", " is not null")
+LOG_WORDS = {"log", "logger", "logging", "print"}
+FIRST_WORD_RE = re.compile(r"[a-z_]+")
+
+
+def _first_words(lines) -> set:
+    """Leading keyword/identifier of each line, e.g. `if`, `return`, `logger`."""
+    words = set()
+    for ln in lines:
+        m = FIRST_WORD_RE.match(ln.text.lstrip().lower())
+        if m:
+            words.add(m.group(0))
+    return words
+
+def extract_action(parsed: ParsedDiff) -> str:
+    if not parsed:
         return "Modified file"
-    d = diff_text.lower()
-    if "+ if" in d and ("is not none" in d or "!= none" in d or "null" in d or " is not null" in d):
+    added = parsed.added
+    plus = _first_words(added)
+    minus = _first_words(parsed.removed)
+    if "if" in plus and any(mk in ln.text.lower() for ln in added for mk in NULL_MARKERS):
         return "Added null check"
-    if "+ try" in d or "+ except" in d:
+    if "try" in plus or "except" in plus:
         return "Added exception handling"
-    if "+ return" in d and "- return" in d:
+    if "return" in plus and "return" in minus:
         return "Modified return logic"
-    if "+ assert" in d:
+    if "assert" in plus:
         return "Added assertion"
-    if "+ log" in d or "+ logger" in d or "+ print" in d:
+    if plus & LOG_WORDS:
         return "Added logging"
-    if "+ def " in d or "- def " in d:
+    if "def" in plus or "def" in minus:
         return "Modified function definition"
-    if "+ raise " in d or "- raise " in d:
+    if "raise" in plus or "raise" in minus:
         return "Adjusted error raising"
-    if "+ import " in d or "- import " in d:
+    if "import" in plus or "import" in minus:
         return "Changed imports"
     return "Modified logic"
 
-def extract_component(diff_text: str) -> str:
-    if not diff_text:
-        return "unknown"
-    for ln in diff_text.splitlines():
-        if "def " in ln:
-            try:
-                return ln.split("def ", 1)[1].split("(", 1)[0].strip()
-            except Exception:
-                continue
-        if ln.startswith("@@") and "def " in ln and "(" in ln:
-            try:
-                frag = ln.split("def ", 1)[1]
-                name = frag.split("(", 1)[0].strip()
-                if name:
-                    return name
-            except Exception:
-                continue
+def extract_component(parsed: ParsedDiff) -> str:
+    # Enclosing function from the hunk header first, then any `def` inside the hunk
+    for hunk in parsed.hunks:
+        if hunk.function:
+            return hunk.function
+        for ln in hunk.lines:
+            m = DEF_RE.search(ln.text)
+            if m:
+                return m.group(1)
     return "unknown"
 
 def build_rectified_message(filename: str, original_msg: str, diff_text: str) -> str:
-    action = extract_action(diff_text)
-    component = extract_component(diff_text)
+    # Parse once; every rule runs on the same hunk model
+    parsed = parse_diff(diff_text or "")
+    action = extract_action(parsed)
+    component = extract_component(parsed)
     return f"{action} in `{filename}` (function: `{component}`) — {original_msg}"
 
 
+def materialize_commit(commit, message_map: dict, fetcher=None, known=None) -> dict:
+    """Pull everything we need out of a pydriller commit (diffs + sources) into plain data.
+
+    With a `fetcher`, sources come from `git cat-file` by blob SHA instead of
+    pydriller; versions already in the blob store `known` are not read at all.
+    """
+    chash = str(commit.hash)
+    parent = commit.parents[0] if commit.parents else None
+    files = []
+    for mod in commit.modified_files:
+        filename = mod.new_path or mod.old_path or ""
+        if not filename:
+            continue
+        entry = {"Filename": filename, "Diff": mod.diff or ""}
+        if fetcher is None:
+            entry["Source Code (before)"] = mod.source_code_before or ""
+            entry["Source Code (current)"] = mod.source_code or ""
+        else:
+            shas = {
+                "Source Code (before)": fetcher.resolve(f"{parent}:{mod.old_path}") if parent and mod.old_path else None,
+                "Source Code (current)": fetcher.resolve(f"{chash}:{mod.new_path}") if mod.new_path else None,
+            }
+            for col, sha in shas.items():
+                if known is None:
+                    entry[col] = fetcher.text(sha)
+                else:
+                    # Raw blob bytes, so the store keeps exactly the object git's SHA names
+                    entry[col] = None if sha in known else (fetcher.read(sha) if sha else "")
+            entry["blob_shas"] = shas
+        files.append(entry)
+    message = message_map.get(chash, commit.msg or "")
+    # LLM once per commit on combined diff (keeps speed high)
+    combined_diff = "\n".join([m.diff or "" for m in commit.modified_files])
+    return {
+        "Hash": chash,
+        "Message": message,
+        "input_ids": encode_commit(message, combined_diff),
+        "files": files,
+    }
+
+
+def build_commit_rows(work: dict, llm_fix_type: str, blob_store) -> list:
+    """Per-file records with full sources (or their blob SHAs) and per-file diff."""
+    rows = []
+    for f in work["files"]:
+        row = {
+            "Hash": work["Hash"],
+            "Message": work["Message"],
+            "Filename": f["Filename"],
+            "Diff": f["Diff"],
+            "LLM Inference (fix type)": llm_fix_type,
+            "Rectified Message": build_rectified_message(f["Filename"], work["Message"], f["Diff"])
+        }
+        for col in ("Source Code (before)", "Source Code (current)"):
+            if blob_store:
+                row[BLOB_COLUMNS[col]] = blob_store.put(f[col], sha=f.get("blob_shas", {}).get(col))
+            else:
+                row[col] = f[col]
+        rows.append(row)
+    return rows
+
+
+def iter_sequential(repo_iter, materialize):
+    """Traverse, materialize and infer one commit at a time."""
+    for commit in repo_iter:
+        work = materialize(commit)
+        yield work, run_llm_inference(work["input_ids"])
+
+
+def iter_pipelined(repo_iter, materialize, workers: int = INFERENCE_WORKERS, queue_size: int = QUEUE_SIZE):
+    """Overlap git traversal with inference; results come back in traversal order.
+
+    One thread walks the repository and materializes (and tokenizes) commits
+    into a bounded queue; `workers` threads drain it through the model. Finished commits are
+    held until every earlier one is done, so output order matches the
+    sequential mode exactly.
+    """
+    work_q = queue.Queue(maxsize=queue_size)
+    result_q = queue.Queue()
+    errors = []
+
+    def produce():
+        try:
+            for idx, commit in enumerate(repo_iter):
+                work_q.put((idx, materialize(commit)))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            for _ in range(workers):
+                work_q.put(None)
+
+    def infer():
+        while True:
+            item = work_q.get()
+            if item is None:
+                result_q.put(None)
+                return
+            idx, work = item
+            try:
+                result_q.put((idx, work, run_llm_inference(work["input_ids"])))
+            except Exception as exc:
+                errors.append(exc)
+                result_q.put(None)
+                return
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=infer, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+
+    pending = {}
+    next_idx = 0
+    finished = 0
+    while finished < workers:
+        item = result_q.get()
+        # Stop at the first failure; everything before it has already been yielded in order
+        if errors:
+            raise errors[0]
+        if item is None:
+            finished += 1
+            continue
+        pending[item[0]] = item[1:]
+        while next_idx in pending:
+            yield pending.pop(next_idx)
+            next_idx += 1
+    for t in threads:
+        t.join()
+
+
 def main():
     commits_df = pd.read_csv(INPUT_CSV)
     target_hashes = commits_df["Hash"].dropna().astype(str).tolist()
     message_map = dict(zip(commits_df["Hash"].astype(str), commits_df["Message"].astype(str)))
 
-    rows = []
+    # With a blob store, rows carry blob SHAs in place of the two source columns
+    blob_store = BlobStore(BLOB_STORE_DIR) if BLOB_STORE_DIR else None
+    columns = [BLOB_COLUMNS.get(c, c) for c in OUTPUT_COLUMNS] if blob_store else OUTPUT_COLUMNS
+
+    # Rows go to disk in chunks as commits finish; a rerun resumes after the last flushed commit
+    if OUTPUT_FORMAT == "parquet":
+        writer_cls, output_path = ParquetDatasetWriter, OUTPUT_DATASET
+    else:
+        writer_cls, output_path = ChunkedCsvWriter, OUTPUT_CSV
+    with writer_cls(output_path, columns, chunk_rows=CHUNK_ROWS, resume=RESUME,
+                    before_flush=blob_store.sync if blob_store else None) as writer:
+        remaining = [h for h in target_hashes if h not in writer.done_hashes]
+        if len(remaining) < len(target_hashes):
+            print(f"Resuming: {len(target_hashes) - len(remaining)} commits already in {output_path}")
+        if not remaining:
+            print("Nothing left to process.")
+            return
 
-    # Iterate commits with a progress bar
-    repo_iter = Repository(REPO_PATH, only_commits=target_hashes).traverse_commits()
-    for commit in tqdm(repo_iter, total=len(target_hashes), desc="Processing commits", unit="commit"):
-        chash = str(commit.hash)
-        cmsg = message_map.get(chash, commit.msg or "")
-
-        # LLM once per commit on combined diff (keeps speed high)
-        combined_diff = "\n".join([m.diff or "" for m in commit.modified_files])
-        llm_fix_type = run_llm_inference(cmsg, combined_diff)
-
-        # Per-file records with full sources and per-file diff
-        for mod in commit.modified_files:
-            filename = mod.new_path or mod.old_path or ""
-            if not filename:
-                continue
-
-            source_before = mod.source_code_before or ""
-            source_current = mod.source_code or ""
-            diff_text = mod.diff or ""
-
-            rectified = build_rectified_message(filename, cmsg, diff_text)
-
-            rows.append({
-                "Hash": chash,
-                "Message": cmsg,
-                "Filename": filename,
-                "Source Code (before)": source_before,
-                "Source Code (current)": source_current,
-                "Diff": diff_text,
-                "LLM Inference (fix type)": llm_fix_type,
-                "Rectified Message": rectified
-            })
-
-    out_df = pd.DataFrame(rows, columns=[
-        "Hash",
-        "Message",
-        "Filename",
-        "Source Code (before)",
-        "Source Code (current)",
-        "Diff",
-        "LLM Inference (fix type)",
-        "Rectified Message"
-    ])
-
-    # Safe CSV writing for large diffs/source (quotes + escaping)
-    out_df.to_csv(
-        OUTPUT_CSV,
-        index=False,
-        quoting=csv.QUOTE_ALL,
-        escapechar='\\'
-    )
-
-    print(f"Done. Wrote {len(out_df)} rows to {OUTPUT_CSV}")
+        # Sources via one persistent `git cat-file` pair instead of pydriller's per-object reads
+        fetcher = CatFileFetcher(REPO_PATH, cache_bytes=BLOB_CACHE_MB * 1024 * 1024) if USE_CAT_FILE else None
+        materialize = functools.partial(materialize_commit, message_map=message_map,
+                                        fetcher=fetcher, known=blob_store)
+
+        repo_iter = Repository(REPO_PATH, only_commits=remaining).traverse_commits()
+        results = iter_pipelined(repo_iter, materialize) if PIPELINE else iter_sequential(repo_iter, materialize)
+
+        # Iterate commits with a progress bar
+        start = time.perf_counter()
+        n_commits = 0
+        for work, llm_fix_type in tqdm(results, total=len(remaining), desc="Processing commits", unit="commit"):
+            writer.add_commit(work["Hash"], build_commit_rows(work, llm_fix_type, blob_store))
+            n_commits += 1
+        elapsed = time.perf_counter() - start
+        if fetcher:
+            print(f"git cat-file: {fetcher.misses} blobs read, {fetcher.hits} served from the LRU")
+            fetcher.close()
+
+    print(f"Done. Wrote {writer.rows_written} rows to {output_path}")
+    mode = f"pipelined, {INFERENCE_WORKERS} workers" if PIPELINE else "sequential"
+    print(f"Throughput ({mode}): {n_commits / max(elapsed, 1e-9):.2f} commits/s, "
+          f"{writer.rows_written / max(elapsed, 1e-9):.2f} rows/s over {elapsed:.1f}s")
+    if blob_store:
+        print(f"Blob store: {len(blob_store)} distinct source versions, {blob_store.hits} duplicates not re-stored")
+        blob_store.close()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,219 @@
+"""Long-lived local inference worker for the T5 and CodeBERT models.
+
+Start it once and leave it running:
+
+    python model_server.py                      # listens on DEFAULT_SOCKET
+    python model_server.py --socket /tmp/x.sock --preload mamiksik/CommitPredictorT5
+
+llm.py and lab-03/semantics.py connect to it through `connect()` when the
+socket is there, and load the models themselves when it is not. Models are
+loaded on first use and stay resident. Each request carries a whole batch of
+texts; requests are served one at a time per model.
+
+Wire format: 4-byte big-endian length + UTF-8 JSON, both ways. Embeddings come
+back as base64-encoded float32 so large batches stay compact.
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_SOCKET = "/tmp/stt_models.sock"
+
+
+# ----------------------------
+# FRAMING
+# ----------------------------
+def _send(sock, obj):
+    data = json.dumps(obj).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("model server closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv(sock):
+    (n,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, n).decode("utf-8"))
+
+
+# ----------------------------
+# SERVER
+# ----------------------------
+class _Models:
+    """Lazily loaded tokenizer/model pairs, one lock per model."""
+
+    def __init__(self):
+        import torch
+
+        self.torch = torch
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self._loaded = {}
+        self._guard = threading.Lock()
+
+    def get(self, name: str, kind: str):
+        with self._guard:
+            if name not in self._loaded:
+                from transformers import AutoModel, AutoModelForSeq2SeqLM, AutoTokenizer
+
+                print(f"Loading model {name}...", flush=True)
+                tokenizer = AutoTokenizer.from_pretrained(name)
+                cls = AutoModelForSeq2SeqLM if kind == "generate" else AutoModel
+                model = cls.from_pretrained(name).to(self.device)
+                model.eval()
+                self._loaded[name] = (tokenizer, model, threading.Lock())
+            return self._loaded[name]
+
+    def generate(self, req):
+        tokenizer, model, lock = self.get(req["model"], "generate")
+        # The tokenizer is held under the lock too: truncation=True reconfigures
+        # the shared fast tokenizer, which must not happen under another thread
+        with lock, self.torch.no_grad():
+            if "input_ids" in req:
+                # Already tokenized (and budgeted) by the client: just pad the batch
+                inputs = tokenizer.pad({"input_ids": req["input_ids"]}, return_tensors="pt").to(self.device)
+            else:
+                inputs = tokenizer(req["texts"], return_tensors="pt", padding=True, truncation=True,
+                                   max_length=req.get("max_input", 512)).to(self.device)
+            outputs = model.generate(**inputs, max_length=req.get("max_length", 64))
+            return {"outputs": tokenizer.batch_decode(outputs, skip_special_tokens=True)}
+
+    def embed(self, req):
+        tokenizer, model, lock = self.get(req["model"], "embed")
+        with lock, self.torch.no_grad():
+            if "input_ids" in req:
+                # Already windowed by the client, special tokens included: just pad the batch
+                inputs = tokenizer.pad({"input_ids": req["input_ids"]}, return_tensors="pt").to(self.device)
+            else:
+                inputs = tokenizer(req["texts"], return_tensors="pt", padding=True, truncation=True,
+                                   max_length=req.get("max_length", 512)).to(self.device)
+            hidden = model(**inputs).last_hidden_state
+        # Mean over real tokens only, so padding in a batch does not shift the vectors
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        vectors = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().cpu().numpy()
+        return {"shape": list(vectors.shape),
+                "vectors": base64.b64encode(vectors.astype(np.float32).tobytes()).decode("ascii")}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                req = _recv(self.request)
+            except ConnectionError:
+                return
+            try:
+                if req.get("op") == "ping":
+                    resp = {"ok": True}
+                elif req.get("op") == "generate":
+                    resp = self.server.models.generate(req)
+                elif req.get("op") == "embed":
+                    resp = self.server.models.embed(req)
+                else:
+                    resp = {"error": f"unknown op {req.get('op')!r}"}
+            except Exception as exc:
+                resp = {"error": f"{type(exc).__name__}: {exc}"}
+            _send(self.request, resp)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, preload: Optional[List[str]] = None):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _Server(socket_path, _Handler)
+    server.models = _Models()
+    for spec in preload or []:
+        # "name" or "name:embed"; generate is the default kind
+        name, _, kind = spec.partition(":")
+        server.models.get(name, kind or "generate")
+    print(f"Model server listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# ----------------------------
+# CLIENT
+# ----------------------------
+class ModelClient:
+    """Drop-in batched generate/embed against a running model_server."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self._lock = threading.Lock()
+
+    def _call(self, req):
+        with self._lock:
+            _send(self.sock, req)
+            resp = _recv(self.sock)
+        if "error" in resp:
+            raise RuntimeError(f"model server: {resp['error']}")
+        return resp
+
+    def ping(self) -> bool:
+        return bool(self._call({"op": "ping"}).get("ok"))
+
+    def generate(self, model: str, texts: List[str], max_input: int = 512, max_length: int = 64) -> List[str]:
+        return self._call({"op": "generate", "model": model, "texts": texts,
+                           "max_input": max_input, "max_length": max_length})["outputs"]
+
+    def generate_ids(self, model: str, input_ids: List[List[int]], max_length: int = 64) -> List[str]:
+        """Like generate, for inputs the caller has tokenized itself."""
+        return self._call({"op": "generate", "model": model, "input_ids": input_ids,
+                           "max_length": max_length})["outputs"]
+
+    def embed(self, model: str, texts: List[str], max_length: int = 512) -> np.ndarray:
+        resp = self._call({"op": "embed", "model": model, "texts": texts, "max_length": max_length})
+        return np.frombuffer(base64.b64decode(resp["vectors"]), dtype=np.float32).reshape(resp["shape"])
+
+    def embed_ids(self, model: str, input_ids: List[List[int]]) -> np.ndarray:
+        """Like embed, for inputs the caller has tokenized itself."""
+        resp = self._call({"op": "embed", "model": model, "input_ids": input_ids})
+        return np.frombuffer(base64.b64decode(resp["vectors"]), dtype=np.float32).reshape(resp["shape"])
+
+    def close(self):
+        self.sock.close()
+
+
+def connect(socket_path: str = DEFAULT_SOCKET) -> Optional[ModelClient]:
+    """Client for a running server, or None so the caller can load models in-process."""
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    try:
+        client = ModelClient(socket_path, timeout=5)
+        client.ping()
+        client.sock.settimeout(None)
+        return client
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep T5/CodeBERT resident behind a Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--preload", nargs="*", default=[],
+                        help='models to load at start, e.g. "mamiksik/CommitPredictorT5" "microsoft/codebert-base:embed"')
+    args = parser.parse_args()
+    serve(args.socket, args.preload)
@@ -1,36 +1,69 @@
-import pandas as pd
-from collections import Counter
 import os
+import sys
 
-# Load the CSV
-df = pd.read_csv("bugfix_commits_with_llm.csv")
+from stream_stats import DistinctCounter, HeavyHitters
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab-02"))
+from corpus import iter_corpus
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+BATCH_ROWS = 50_000           # corpus rows held in memory at a time
+TOP_N = 10
+SKETCH_CAPACITY = 10_000      # items tracked per heavy-hitters table (counts stay exact below this)
+EXACT_COMMIT_LIMIT = 1_000_000  # distinct commits counted exactly; beyond it, HyperLogLog
+FIX_COL = "LLM Inference (fix type)"
+
+
+def extension_counts(filename_counts):
+    """Fold one chunk's filename counts into extension counts (splitext runs once per distinct name)."""
+    ext = [os.path.splitext(name)[1] for name in filename_counts.index]
+    return filename_counts.groupby(ext, sort=False).sum().rename_axis("Extension")
+
+
+def print_counts(title, sketch, n=None):
+    print(title)
+    print(sketch.top(n).to_string())
+    if not sketch.exact:
+        print(f"(approximate: each count may be low by up to {sketch.error})")
+    print()
+
+
+# ----------------------------
+# ONE PASS OVER THE CORPUS
+# ----------------------------
+commits = DistinctCounter(EXACT_COMMIT_LIMIT)
+fix_types = HeavyHitters(SKETCH_CAPACITY)
+filenames = HeavyHitters(SKETCH_CAPACITY)
+extensions = HeavyHitters(SKETCH_CAPACITY)
+total_files = 0
+
+# Only the columns we report on are read (Parquet dataset if present, else the CSV)
+for chunk in iter_corpus(["Hash", "Filename", FIX_COL], batch_rows=BATCH_ROWS,
+                         csv_path="bugfix_commits_with_llm.csv",
+                         dataset_dir="bugfix_commits_with_llm.parquet"):
+    total_files += len(chunk)
+    commits.update(chunk["Hash"])
+    fix_types.update(chunk[FIX_COL])
+    names = chunk["Filename"].value_counts()
+    filenames.update_counts(names)
+    extensions.update_counts(extension_counts(names))
 
 # 1. Total number of unique commits and total modified files
-total_commits = df["Hash"].nunique()
-total_files = len(df)
+total_commits = commits.count()
 
 # 2. Average number of modified files per commit
 avg_files_per_commit = total_files / total_commits if total_commits else 0
 
-# 3. Distribution of fix types from LLM
-fix_type_counts = df["LLM Inference (fix type)"].value_counts()
-
-# 4. Most frequently modified filenames and extensions
-filename_counts = df["Filename"].value_counts().head(10)
-df["Extension"] = df["Filename"].apply(lambda x: os.path.splitext(x)[1])
-extension_counts = df["Extension"].value_counts().head(10)
-
 # Print results
-print(f"Total unique commits: {total_commits}")
+print(f"Total unique commits: {total_commits}" + ("" if commits.exact else " (HyperLogLog estimate)"))
 print(f"Total modified files: {total_files}")
 print(f"Average files per commit: {avg_files_per_commit:.2f}\n")
 
-print("Distribution of LLM Inference (fix type):")
-print(fix_type_counts.to_string(), "\n")
-
-print("Most frequently modified filenames:")
-print(filename_counts.to_string(), "\n")
-
-print("Most frequently modified file extensions:")
-print(extension_counts.to_string())
+# 3. Distribution of fix types from LLM
+print_counts(f"Distribution of {FIX_COL}:", fix_types)
 
+# 4. Most frequently modified filenames and extensions
+print_counts("Most frequently modified filenames:", filenames, TOP_N)
+print_counts("Most frequently modified file extensions:", extensions, TOP_N)
@@ -1,63 +1,259 @@
+import os
+import signal
+import sys
+from collections import Counter
 import pandas as pd
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
 from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab-02"))
+from corpus import KEY_COLUMNS, SOURCE_COLUMNS, iter_corpus
+from blob_store import git_blob_sha
+from diff_parser import parse_diff
+from metrics_cache import MetricsCache
+from metrics_engine import single_parse_metrics, touched_function_metrics
+from stage_io import TableWriter
+
+try:
+    import resource
+except ImportError:  # Windows: no per-worker memory cap
+    resource = None
+
 # ----------------------------
 # CONFIG
 # ----------------------------
 INPUT_CSV = "/home/set-iitgn-vm/Desktop/STT_lab_03/bugfix_commits_with_llm.csv"
+INPUT_DATASET = "/home/set-iitgn-vm/Desktop/STT_lab_03/bugfix_commits_with_llm.parquet"  # preferred when present
+INPUT_BLOBS = "/home/set-iitgn-vm/Desktop/STT_lab_03/source_blobs"  # resolves source blob references, if used
 OUTPUT_CSV = "lab2_structural_metrics_first.csv"
+OUTPUT_FUNCTIONS_CSV = "lab2_function_metrics.csv"
 
-# ----------------------------
-# LOAD DATA
-# ----------------------------
-df = pd.read_csv(INPUT_CSV)
-df.columns = df.columns.str.strip()
+# "file": MI/CC/LOC of every whole file, before and after (OUTPUT_CSV)
+# "function": MI/CC/LOC only of the functions the diff touches, one row each (OUTPUT_FUNCTIONS_CSV)
+METRICS_MODE = "file"
+
+LIMIT = None        # None = whole dataset; e.g. 100 for a quick look at the first rows
+BATCH_ROWS = 2000   # rows read from the corpus, scored and appended to OUTPUT_CSV per step
+CHUNKSIZE = 16      # distinct source versions (rows, per function) per task handed to a worker
+PROCESSES = cpu_count()
+# Per source version; None = no limit (needs SIGALRM, so not on Windows). The alarm
+# is only seen between Python bytecodes, so it stops radon's analysis but not a
+# single ast.parse/compile call running in C; MAX_SOURCE_CHARS is what bounds those.
+TIMEOUT_S = 30
+# Address space a worker may grow by beyond what it starts with (it inherits the
+# parent's libraries and arenas, so an absolute cap could sit below its starting
+# size); None = no limit. Needs /proc (Linux); elsewhere no cap is set.
+MEMORY_LIMIT_MB = 2048
+MAX_SOURCE_CHARS = 2_000_000  # bigger sources (usually generated code) are skipped without parsing
+MAX_TASKS_PER_CHILD = 200     # replace a worker after this many tasks; None = keep workers all run
+METRICS_CACHE = "structural_metrics_cache.sqlite"  # content hash -> metrics, kept across runs; None disables
+METRICS_ENGINE = "radon-mi+cc/status"  # cache namespace; change it whenever safe_metrics' numbers change
+CACHEABLE_STATUSES = ("ok", "error")  # timeouts / memory failures depend on the limits, so they are retried
 
-# Take only the first 100 rows
-df = df.head(100)
+# Output column types, declared so every batch writes the same schema, even a
+# batch in which every source failed or was empty (MI is always a float)
+METRIC_DTYPES = {
+    "MI_Before": "float64", "MI_After": "float64", "MI_Change": "float64",
+    "CC_Before": "int64", "CC_After": "int64", "CC_Change": "int64",
+    "LOC_Before": "int64", "LOC_After": "int64", "LOC_Change": "int64",
+}
 
 # ----------------------------
 # FUNCTION TO COMPUTE METRICS
 # ----------------------------
-def compute_metrics_row(row):
-    def safe_metrics(code):
-        if not isinstance(code, str) or code.strip() == "":
-            return 0, 0, 0
-        try:
-            mi = mi_visit(code, True)
-            cc = sum(c.complexity for c in cc_visit(code))
-            loc = len(code.splitlines())
-        except Exception:
-            mi, cc, loc = 0, 0, 0
-        return mi, cc, loc
-
-    mi_b, cc_b, loc_b = safe_metrics(row["Source Code (before)"])
-    mi_a, cc_a, loc_a = safe_metrics(row["Source Code (current)"])
-    return mi_b, mi_a, cc_b, cc_a, loc_b, loc_a
+class MetricsTimeout(Exception):
+    pass
 
-# ----------------------------
-# PARALLEL PROCESSING WITH PROGRESS
-# ----------------------------
-results = []
-with Pool(cpu_count()) as pool:
-    for res in tqdm(pool.imap(compute_metrics_row, [row for _, row in df.iterrows()]),
-                    total=len(df), desc="Computing Structural Metrics"):
-        results.append(res)
+def _on_alarm(signum, frame):
+    raise MetricsTimeout()
+
+def _address_space_bytes():
+    """This process's current virtual size (VmSize), or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def init_worker(memory_limit_mb):
+    """Pool initializer: install the timeout handler and cap how far this worker's memory can grow."""
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+    current = _address_space_bytes()
+    if memory_limit_mb and resource is not None and current is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        cap = current + memory_limit_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            cap = min(cap, hard)
+        if soft == resource.RLIM_INFINITY or cap < soft:
+            resource.setrlimit(resource.RLIMIT_AS, (cap, hard))
+
+def run_guarded(fn, *args):
+    """(fn(*args), "ok") within TIMEOUT_S, else (None, "timeout" / "memory" / "error").
+
+    The timeout interrupts Python code only; see TIMEOUT_S.
+    """
+    timed = bool(TIMEOUT_S) and hasattr(signal, "SIGALRM")
+    if timed:
+        signal.setitimer(signal.ITIMER_REAL, TIMEOUT_S)
+    try:
+        return fn(*args), "ok"
+    except MetricsTimeout:
+        return None, "timeout"
+    except MemoryError:
+        return None, "memory"
+    except Exception:
+        return None, "error"
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def safe_metrics(code):
+    """(MI, CC, LOC, status); status is ok, empty, skipped, timeout, memory or error."""
+    if not isinstance(code, str) or code.strip() == "":
+        return 0.0, 0, 0, "empty"
+    if len(code) > MAX_SOURCE_CHARS:
+        return 0.0, 0, 0, "skipped"
+    # One parse + one tokenize per source (see metrics_engine.benchmark for the comparison)
+    res, status = run_guarded(single_parse_metrics, code, True)
+    mi, cc, loc = res if res is not None else (0.0, 0, 0)
+    return mi, cc, loc, status
+
+def _touched_functions(before, after, diff):
+    parsed = parse_diff(diff)
+    return touched_function_metrics(before, after, parsed.changed_old_lines(), parsed.changed_new_lines(), True)
+
+def safe_function_metrics(task):
+    """({function: (before, after)}, status) for one (before, after, diff) row; see touched_function_metrics."""
+    before, after, diff = (x if isinstance(x, str) else "" for x in task)
+    if not diff.strip() or not (before.strip() or after.strip()):
+        return {}, "empty"
+    if max(len(before), len(after)) > MAX_SOURCE_CHARS:
+        return {}, "skipped"
+    res, status = run_guarded(_touched_functions, before, after, diff)
+    return res or {}, status
+
+def content_key(code):
+    """Blob SHA of a source version; None for empty sources, which always score 0."""
+    if not isinstance(code, str) or code.strip() == "":
+        return None
+    return git_blob_sha(code.encode("utf-8", errors="surrogateescape"))
+
+def compute_batch_metrics(pool, cache, before, after):
+    """Metrics and status for every (before, after) pair, analysing each distinct version once.
+
+    Versions are keyed by content hash: hits come from the persistent cache,
+    and only unseen versions (each once, however often it repeats) go to the
+    workers. New results are written back to the cache by this process only.
+    """
+    keys_b = [content_key(c) for c in before]
+    keys_a = [content_key(c) for c in after]
+    codes = {}
+    for key, code in zip(keys_b + keys_a, list(before) + list(after)):
+        if key is not None:
+            codes[key] = code
+
+    known = cache.get_many(codes) if cache else {}
+    todo = [k for k in codes if k not in known]
+    for key, res in zip(todo, pool.imap(safe_metrics, [codes[k] for k in todo], chunksize=CHUNKSIZE)):
+        known[key] = res
+    if cache and todo:
+        cache.put_many({k: known[k] for k in todo if known[k][3] in CACHEABLE_STATUSES})
+
+    empty = (0.0, 0, 0, "empty")
+    results = []
+    for kb, ka in zip(keys_b, keys_a):
+        mi_b, cc_b, loc_b, st_b = known[kb] if kb else empty
+        mi_a, cc_a, loc_a, st_a = known[ka] if ka else empty
+        results.append((mi_b, mi_a, cc_b, cc_a, loc_b, loc_a, st_b, st_a))
+    return results, len(todo)
+
+def add_metric_columns(df, results):
+    (df["MI_Before"], df["MI_After"], df["CC_Before"], df["CC_After"], df["LOC_Before"], df["LOC_After"],
+     df["Status_Before"], df["Status_After"]) = zip(*results)
+
+    # Compute changes
+    df["MI_Change"] = df["MI_After"] - df["MI_Before"]
+    df["CC_Change"] = df["CC_After"] - df["CC_Before"]
+    df["LOC_Change"] = df["LOC_After"] - df["LOC_Before"]
+    return df
+
+def function_rows(df, results):
+    """One row per touched function; rows whose diff could not be measured keep a single status row."""
+    rows = []
+    for (commit_hash, message, filename), (functions, status) in zip(
+            df[KEY_COLUMNS].itertuples(index=False, name=None), results):
+        if not functions:
+            if status != "ok":
+                rows.append([commit_hash, message, filename, "", "", 0.0, 0.0, 0, 0, 0, 0, status])
+            continue
+        for name, (old, new) in functions.items():
+            change = "added" if old is None else "removed" if new is None else "modified"
+            mi_b, cc_b, loc_b = old or (0.0, 0, 0)
+            mi_a, cc_a, loc_a = new or (0.0, 0, 0)
+            rows.append([commit_hash, message, filename, name, change,
+                         mi_b, mi_a, cc_b, cc_a, loc_b, loc_a, status])
+    out = pd.DataFrame(rows, columns=KEY_COLUMNS + ["Function", "Function_Change", "MI_Before", "MI_After",
+                                                    "CC_Before", "CC_After", "LOC_Before", "LOC_After", "Status"])
+    out["MI_Change"] = out["MI_After"] - out["MI_Before"]
+    out["CC_Change"] = out["CC_After"] - out["CC_Before"]
+    out["LOC_Change"] = out["LOC_After"] - out["LOC_Before"]
+    return out
 
 # ----------------------------
-# UNPACK RESULTS
+# PARALLEL PROCESSING WITH PROGRESS
 # ----------------------------
-df["MI_Before"], df["MI_After"], df["CC_Before"], df["CC_After"], df["LOC_Before"], df["LOC_After"] = zip(*results)
+def main():
+    by_function = METRICS_MODE == "function"
+    output = OUTPUT_FUNCTIONS_CSV if by_function else OUTPUT_CSV
+    # Only the key, source and diff columns are read, BATCH_ROWS at a time. In file mode the
+    # diff is passed through to the output so semantics.py (COMPARE = "diff") can use it
+    columns = KEY_COLUMNS + SOURCE_COLUMNS + ["Diff"]
+    batches = iter_corpus(columns, batch_rows=BATCH_ROWS, csv_path=INPUT_CSV,
+                          dataset_dir=INPUT_DATASET, blob_dir=INPUT_BLOBS)
+    cache = MetricsCache(METRICS_CACHE, METRICS_ENGINE) if METRICS_CACHE and not by_function else None
+    written = 0
+    analysed = 0
+    statuses = Counter()
+    # A worker stuck past TIMEOUT_S or over MEMORY_LIMIT_MB fails only its own source
+    pool = Pool(PROCESSES, initializer=init_worker, initargs=(MEMORY_LIMIT_MB,),
+                maxtasksperchild=MAX_TASKS_PER_CHILD)
+    with pool, tqdm(total=LIMIT, desc="Computing Structural Metrics") as bar, TableWriter(output, METRIC_DTYPES) as writer:
+        for df in batches:
+            if LIMIT is not None:
+                df = df.head(LIMIT - written).copy()
+            if df.empty:
+                break
+            if by_function:
+                tasks = zip(df["Source Code (before)"], df["Source Code (current)"], df["Diff"])
+                results = list(pool.imap(safe_function_metrics, tasks, chunksize=CHUNKSIZE))
+                analysed += sum(len(functions) for functions, _ in results)
+                statuses.update(status for _, status in results)
+                out = function_rows(df, results)
+            else:
+                results, n_new = compute_batch_metrics(pool, cache, df["Source Code (before)"].tolist(),
+                                                       df["Source Code (current)"].tolist())
+                analysed += n_new
+                statuses.update(r[6] for r in results)
+                statuses.update(r[7] for r in results)
+                out = add_metric_columns(df, results)
+            bar.update(len(df))
 
-# Compute changes
-df["MI_Change"] = df["MI_After"] - df["MI_Before"]
-df["CC_Change"] = df["CC_After"] - df["CC_Before"]
-df["LOC_Change"] = df["LOC_After"] - df["LOC_Before"]
+            # Save each batch as soon as it is done
+            writer.append(out)
+            written += len(df)
+            if LIMIT is not None and written >= LIMIT:
+                break
 
-# Save updated dataset
-df.to_csv(OUTPUT_CSV, index=False)
-print(f"Done! Structural metrics for first 100 rows saved to '{OUTPUT_CSV}'.")
+    if cache:
+        cache.close()
+    print(f"Done! Structural metrics for {written} rows saved to '{output}'.")
+    if by_function:
+        print(f"Measured {analysed} touched functions (before and after).")
+        print("Rows by status:", dict(statuses))
+    else:
+        print(f"Analysed {analysed} new source versions; everything else came from the cache or repeats.")
+        print("Source versions by status:", dict(statuses))
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import numpy as np
+
+from sqlite_cache import ContentCache
+
+
+class EmbeddingCache(ContentCache):
+    """Persistent content-hash -> embedding vector table, namespaced by a model key.
+
+    The model key is the model name plus anything else that changes the
+    vectors (pooling, windows). Vectors are stored as raw float32 bytes.
+    """
+
+    table = "embeddings"
+    namespace_column = "model"
+    value_columns = [("vec", "BLOB NOT NULL")]
+
+    def __init__(self, path: str, model: str):
+        super().__init__(path, model)
+
+    def _encode(self, value):
+        return (np.asarray(value, dtype=np.float32).tobytes(),)
+
+    def _decode(self, row) -> np.ndarray:
+        return np.frombuffer(row[0], dtype=np.float32)
@@ -0,0 +1,120 @@
+import math
+import sys
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+
+def bleu_batch(references, hypotheses, max_n=4):
+    """NLTK's `sentence_bleu([ref], hyp)` (uniform weights, no smoothing) for many pairs at once.
+
+    Tokens are factorized to integer ids once for the whole batch; every
+    n-gram is then an integer rank built from the (n-1)-gram rank and the next
+    token, scoped to its row, so clipped counts for all rows and all orders
+    come from a few hash and bincount passes instead of per-row Counters of
+    tuples. The final combination follows NLTK step for step (zero unigram
+    matches give 0, a zero higher-order match count is replaced by the
+    smallest float), so the scores are the same floats NLTK returns.
+    """
+    references = [list(r) for r in references]
+    hypotheses = [list(h) for h in hypotheses]
+    rows_n = len(hypotheses)
+    hyp_lens = np.fromiter((len(h) for h in hypotheses), np.int64, rows_n)
+    ref_lens = np.fromiter((len(r) for r in references), np.int64, rows_n)
+    lens = np.concatenate([hyp_lens, ref_lens])
+    total = int(lens.sum())
+
+    # Hypothesis tokens of every row, then reference tokens of every row
+    tokens = np.fromiter(chain(chain.from_iterable(hypotheses), chain.from_iterable(references)),
+                         dtype=object, count=total)
+    ids, vocab = pd.factorize(tokens)
+    vocab = max(len(vocab), 1)
+    rows = np.repeat(np.tile(np.arange(rows_n), 2), lens)
+    is_hyp = np.arange(total) < int(hyp_lens.sum())
+    starts = np.cumsum(lens) - lens
+    remaining = np.repeat(starts + lens, lens) - np.arange(total)  # tokens from here to the row's end
+
+    matches = np.zeros((max_n, rows_n))
+    gram = None
+    for n in range(1, max_n + 1):
+        if n == 1:
+            gram, uniques = pd.factorize(rows * vocab + ids)
+        else:
+            # Positions near a row's end pick up the next row's tokens; they are masked out below
+            nxt = np.zeros_like(ids)
+            nxt[:total - n + 1] = ids[n - 1:]
+            gram, uniques = pd.factorize(gram * vocab + nxt)
+        valid = remaining >= n
+        hyp_counts = np.bincount(gram[valid & is_hyp], minlength=len(uniques))
+        ref_counts = np.bincount(gram[valid & ~is_hyp], minlength=len(uniques))
+        row_of = np.zeros(len(uniques), dtype=np.int64)
+        row_of[gram] = rows
+        matches[n - 1] = np.bincount(row_of, weights=np.minimum(hyp_counts, ref_counts), minlength=rows_n)
+
+    weight = 1 / max_n
+    scores = []
+    for b in range(rows_n):
+        if matches[0, b] == 0:
+            scores.append(0.0)
+            continue
+        hyp_len, ref_len = int(hyp_lens[b]), int(ref_lens[b])
+        logs = []
+        for n in range(max_n):
+            count = int(matches[n, b])
+            p = count / max(1, hyp_len - n) if count else sys.float_info.min
+            logs.append(weight * math.log(p))
+        bp = 1 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+        scores.append(bp * math.exp(math.fsum(logs)))
+    return scores
+
+
+def benchmark(pairs, repeat=1):
+    """Time NLTK's sentence_bleu row by row against bleu_batch on the same (reference, hypothesis) strings."""
+    import warnings
+
+    from nltk.translate.bleu_score import sentence_bleu
+
+    refs = [r.split() for r, _ in pairs]
+    hyps = [h.split() for _, h in pairs]
+    timings = {}
+    results = {}
+    for name in ("nltk sentence_bleu", "bleu_batch"):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if name == "bleu_batch":
+                out = bleu_batch(refs, hyps)
+            else:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    out = [sentence_bleu([r], h) for r, h in zip(refs, hyps)]
+            best = min(best, time.perf_counter() - start)
+        timings[name], results[name] = best, out
+    old, new = results.values()
+    worst = max((abs(a - b) for a, b in zip(old, new)), default=0.0)
+    for name, t in timings.items():
+        print(f"{name:20s} {t:8.3f}s  ({len(pairs) / t:8.1f} pairs/s)")
+    base, fast = timings.values()
+    print(f"Speedup: {base / fast:.2f}x over {len(pairs)} pairs, max |difference| {worst:.3g}")
+
+
+if __name__ == "__main__":
+    # python fast_bleu.py file1.py file2.py ...   (default: the first 60 stdlib modules)
+    # Each file is paired with an edited copy of itself (every 7th line dropped, a line appended),
+    # roughly what a before/after pair of a small fix looks like.
+    paths = sys.argv[1:]
+    if not paths:
+        import glob
+        import os
+
+        paths = sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[:60]
+    pairs = []
+    for p in paths:
+        with open(p, encoding="utf-8", errors="ignore") as fh:
+            before = fh.read()
+        lines = before.splitlines()
+        after = "\n".join(ln for i, ln in enumerate(lines) if i % 7 != 3) + "\nreturn None\n"
+        pairs.append((before, after))
+    benchmark(pairs)
@@ -0,0 +1,32 @@
+from typing import Tuple
+
+from sqlite_cache import ContentCache
+
+Metrics = Tuple[float, int, int, str]  # (MI, CC, LOC, status)
+
+
+class MetricsCache(ContentCache):
+    """Persistent content-hash -> (MI, CC, LOC, status) table, namespaced by metrics engine."""
+
+    table = "metrics"
+    namespace_column = "engine"
+    value_columns = [("mi", "REAL"), ("cc", "INTEGER"), ("loc", "INTEGER"),
+                     ("status", "TEXT NOT NULL DEFAULT 'ok'")]
+    row_filter = "status != 'legacy'"
+
+    def __init__(self, path: str, engine: str):
+        super().__init__(path, engine)
+
+    def _migrate(self):
+        # Caches written before statuses were recorded get the column added. Those
+        # rows stored timeouts and parse failures as (0, 0, 0) too, so they are
+        # marked 'legacy' and never served
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(metrics)")]
+        if "status" not in columns:
+            self.conn.execute("ALTER TABLE metrics ADD COLUMN status TEXT NOT NULL DEFAULT 'legacy'")
+
+    def _encode(self, value: Metrics):
+        return value
+
+    def _decode(self, row) -> Metrics:
+        return row
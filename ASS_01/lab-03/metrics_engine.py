@@ -0,0 +1,213 @@
+import ast
+import bisect
+import io
+import re
+import sys
+import time
+import tokenize
+
+from radon.complexity import cc_visit
+from radon.metrics import h_visit_ast, mi_compute, mi_visit
+from radon.raw import Module, _logical, analyze, is_single_token
+from radon.visitors import ComplexityVisitor
+
+# Characters str.splitlines() treats as line breaks but tokenize does not
+ODD_BREAKS_RE = re.compile("\r(?!\n)|[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+OPEN_BRACKETS = {"(", "[", "{"}
+CLOSE_BRACKETS = {")", "]", "}"}
+# The line breaks ast counts line numbers by
+LINE_BREAK_RE = re.compile("\r\n|\r|\n")
+
+
+def raw_metrics(code):
+    """radon.raw.analyze's numbers from a single tokenize pass over the whole source.
+
+    radon re-tokenizes the (stripped) source line by line, growing the buffer
+    until each statement tokenizes cleanly, which is quadratic on long
+    statements and dominates the cost of MI. Here the source is tokenized once
+    and cut into the same groups (one logical line, or one blank/comment line),
+    each then counted with radon's own helpers. Sources with line breaks that
+    splitlines() and tokenize disagree on go through radon unchanged.
+    """
+    if ODD_BREAKS_RE.search(code):
+        return analyze(code)
+    lines = code.splitlines()
+    lloc = comments = single_comments = multi = blank = sloc = 0
+    counted = 0
+    group = []
+    depth = 0
+    endmarker = (tokenize.ENDMARKER, "", (0, 0), (0, 0), "")
+    for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+        ttype = tok[0]
+        # radon tokenizes stripped lines one statement at a time, so it never sees these
+        if ttype in (tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+            continue
+        group.append(tok)
+        if ttype == tokenize.OP:
+            if tok[1] in OPEN_BRACKETS:
+                depth += 1
+            elif tok[1] in CLOSE_BRACKETS:
+                depth -= 1
+        if ttype == tokenize.NEWLINE or (ttype == tokenize.NL and depth == 0):
+            parsed_lines = [ln.strip() for ln in lines[group[0][2][0] - 1:tok[3][0]]]
+            counted += len(parsed_lines)
+            tokens = group + [endmarker]
+            comments += sum(1 for t in tokens if t[0] == tokenize.COMMENT)
+            if is_single_token(tokenize.COMMENT, tokens):
+                single_comments += 1
+            elif is_single_token(tokenize.STRING, tokens):
+                if tokens[0][2][0] == tokens[0][3][0]:
+                    single_comments += 1
+                else:
+                    multi += sum(1 for ln in parsed_lines if ln)
+                    blank += sum(1 for ln in parsed_lines if not ln)
+            else:
+                for ln in parsed_lines:
+                    if ln:
+                        sloc += 1
+                    else:
+                        blank += 1
+            lloc += _logical(tokens)
+            group = []
+    if counted != len(lines) or group:
+        # Some line was not covered by exactly one group; let radon decide
+        return analyze(code)
+    loc = sloc + blank + multi + single_comments
+    return Module(loc, lloc, sloc, comments, multi, blank, single_comments)
+
+
+def radon_metrics(code, multi=True):
+    """The original path: mi_visit + cc_visit + splitlines (two parses, plus radon's line-by-line tokenizing)."""
+    mi = mi_visit(code, multi)
+    cc = sum(c.complexity for c in cc_visit(code))
+    loc = len(code.splitlines())
+    return mi, cc, loc
+
+
+def single_parse_metrics(code, multi=True):
+    """MI, total CC and LOC from one `ast.parse`, one complexity walk and one tokenize pass.
+
+    Same numbers as `radon_metrics`: the complexity visitor's blocks give the
+    CC sum and its total_complexity feeds MI, the Halstead volume comes from the
+    same tree, and the raw (token) analysis supplies both the MI inputs and LOC.
+    """
+    return _tree_metrics(ast.parse(code), raw_metrics(code), multi)
+
+
+def function_spans(tree):
+    """(qualified name, node, first line, last line) for each function radon scores as a block.
+
+    Functions and methods are found under classes and compound statements;
+    functions nested in a function are folded into it, as radon's CC does. A
+    span starts at the first decorator. Redefinitions (property setters,
+    conditional definitions) are numbered in order: `name`, `name#2`, ...
+    """
+    spans = []
+    seen = {}
+
+    def walk(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = prefix + child.name
+                seen[name] = seen.get(name, 0) + 1
+                if seen[name] > 1:
+                    name += f"#{seen[name]}"
+                first = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                spans.append((name, child, first, child.end_lineno))
+            elif isinstance(child, ast.ClassDef):
+                walk(child, prefix + child.name + ".")
+            else:
+                walk(child, prefix)
+
+    walk(tree, "")
+    return spans
+
+
+def touched_function_metrics(before, after, old_lines, new_lines, multi=True):
+    """{function: ((MI, CC, LOC) before, (MI, CC, LOC) after)} for functions the diff touches.
+
+    A function is touched when one of `old_lines` falls inside it in `before`
+    or one of `new_lines` in `after`; it is then measured in both versions
+    (None on the side where it does not exist). Each version is parsed once
+    and only the touched functions are analysed, each as if it were a module
+    of its own (the numbers match `single_parse_metrics` on the dedented
+    function source).
+    """
+    versions = []
+    touched = set()
+    for code, lines in ((before, old_lines), (after, new_lines)):
+        if not code.strip():
+            versions.append(({}, []))
+            continue
+        tree = ast.parse(code)
+        spans = {name: (node, first, last) for name, node, first, last in function_spans(tree)}
+        lines = sorted(set(lines))
+        for name, (_, first, last) in spans.items():
+            i = bisect.bisect_left(lines, first)
+            if i < len(lines) and lines[i] <= last:
+                touched.add(name)
+        versions.append((spans, LINE_BREAK_RE.split(code)))
+
+    out = {}
+    for name in sorted(touched):
+        pair = []
+        for spans, src in versions:
+            if name not in spans:
+                pair.append(None)
+                continue
+            node, first, last = spans[name]
+            segment = "\n".join(src[first - 1:last]) + "\n"
+            module = ast.Module(body=[node], type_ignores=[])
+            pair.append(_tree_metrics(module, raw_metrics(segment), multi))
+        out[name] = tuple(pair)
+    return out
+
+
+def _tree_metrics(tree, raw, multi):
+    visitor = ComplexityVisitor.from_ast(tree)
+    volume = h_visit_ast(tree).total.volume
+    comment_lines = raw.comments + (raw.multi if multi else 0)
+    comments = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+    mi = mi_compute(volume, visitor.total_complexity, raw.lloc, comments)
+    cc = sum(block.complexity for block in visitor.blocks)
+    return mi, cc, raw.loc
+
+
+def benchmark(sources, repeat=1):
+    """Time both engines on the same sources and check they agree."""
+    sources = [s for s in sources if isinstance(s, str) and s.strip()]
+    timings = {}
+    results = {}
+    for name, fn in (("radon (mi_visit + cc_visit)", radon_metrics), ("single parse", single_parse_metrics)):
+        best = float("inf")
+        for _ in range(repeat):
+            out = []
+            start = time.perf_counter()
+            for code in sources:
+                try:
+                    out.append(fn(code))
+                except Exception:
+                    out.append(None)
+            best = min(best, time.perf_counter() - start)
+        timings[name], results[name] = best, out
+    old, new = results.values()
+    mismatches = sum(1 for a, b in zip(old, new) if a != b)
+    for name, t in timings.items():
+        print(f"{name:30s} {t:8.3f}s  ({len(sources) / t:8.1f} sources/s)")
+    base, fast = timings.values()
+    print(f"Speedup: {base / fast:.2f}x over {len(sources)} sources, {mismatches} mismatching results")
+
+
+if __name__ == "__main__":
+    # python metrics_engine.py file1.py file2.py ...   (default: the first 40 stdlib modules)
+    paths = sys.argv[1:]
+    if not paths:
+        import glob
+        import os
+
+        paths = sorted(glob.glob(os.path.join(os.path.dirname(ast.__file__), "*.py")))[:40]
+    srcs = []
+    for p in paths:
+        with open(p, encoding="utf-8", errors="ignore") as fh:
+            srcs.append(fh.read())
+    benchmark(srcs)
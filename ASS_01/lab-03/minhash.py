@@ -0,0 +1,81 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+EMPTY = np.uint64(1 << 32)      # signature value of a document without shingles (above every hash)
+SHINGLE_MULT = np.uint64(0x9E3779B97F4A7C15)
+BLOCK_SHINGLES = 8192           # shingles hashed against all permutations per step (bounds memory)
+
+
+def _shingle_hashes(docs, shingle):
+    """(hash per shingle, document index per shingle) for token lists `docs`, in document order.
+
+    Shingles are runs of `shingle` consecutive tokens; a document shorter than
+    that is one shingle of all its tokens. Token hashes are pandas' stable
+    hash_array, so signatures are the same in every process and run.
+    """
+    lens = np.fromiter((len(d) for d in docs), np.int64, len(docs))
+    total = int(lens.sum())
+    tokens = np.fromiter(chain.from_iterable(docs), dtype=object, count=total)
+    tok = pd.util.hash_array(tokens) if total else np.zeros(0, dtype=np.uint64)
+    rows = np.repeat(np.arange(len(docs)), lens)
+    remaining = np.repeat(np.cumsum(lens), lens) - np.arange(total)  # tokens from here to the doc's end
+    h = tok.copy()
+    for j in range(1, shingle):
+        nxt = np.zeros_like(tok)
+        nxt[:total - j] = tok[j:]
+        # Tokens past the end of the document do not belong to the shingle
+        h = h * SHINGLE_MULT + np.where(remaining > j, nxt, np.uint64(0))
+    starts = remaining >= shingle
+    starts |= (remaining == np.repeat(lens, lens)) & (np.repeat(lens, lens) < shingle)
+    return h[starts], rows[starts]
+
+
+def minhash_signatures(docs, num_perm=128, shingle=4, seed=1):
+    """(len(docs), num_perm) MinHash signatures of token lists, all in vectorized numpy.
+
+    Each permutation is a multiply-shift hash (a * x + b, top 32 bits) of the
+    shingle hash; a document's signature is the minimum per permutation.
+    Shingles are processed BLOCK_SHINGLES at a time and reduced per document
+    with minimum.reduceat, so memory stays bounded for huge files.
+    """
+    with np.errstate(over="ignore"):
+        hashes, rows = _shingle_hashes([list(d) for d in docs], shingle)
+        rng = np.random.default_rng(seed)
+        a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        sig = np.full((len(docs), num_perm), EMPTY, dtype=np.uint64)
+        for s in range(0, len(hashes), BLOCK_SHINGLES):
+            h, r = hashes[s:s + BLOCK_SHINGLES], rows[s:s + BLOCK_SHINGLES]
+            vals = (h[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+            seg = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+            docs_here = r[seg]
+            sig[docs_here] = np.minimum(sig[docs_here], np.minimum.reduceat(vals, seg, axis=0))
+    return sig
+
+
+def jaccard_estimates(sig_a, sig_b):
+    """Estimated Jaccard similarity of each row pair: the share of equal signature entries."""
+    return (sig_a == sig_b).mean(axis=1)
+
+
+def lsh_candidates(sig_a, sig_b, bands):
+    """LSH banding: True where at least one band of rows/bands entries matches exactly.
+
+    With r = num_perm / bands rows per band, pairs above Jaccard of about
+    (1 / bands) ** (1 / r) are flagged with high probability and pairs well
+    below it rarely are; a cheap yes/no triage of "near-identical" changes.
+    """
+    n, perms = sig_a.shape
+    r = perms // bands
+    a = sig_a[:, :bands * r].reshape(n, bands, r)
+    b = sig_b[:, :bands * r].reshape(n, bands, r)
+    return (a == b).all(axis=2).any(axis=1)
+
+
+def minhash_similarity(before, after, num_perm=128, shingle=4, seed=1):
+    """Estimated Jaccard similarity between the shingle sets of each (before, after) token-list pair."""
+    before, after = list(before), list(after)
+    sig = minhash_signatures(before + after, num_perm, shingle, seed)
+    return jaccard_estimates(sig[:len(before)], sig[len(before):])
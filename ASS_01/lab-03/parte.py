@@ -1,29 +1,77 @@
+import numpy as np
 import pandas as pd
+from stage_io import read_table, write_table
 
 INPUT_CSV = "lab2_change_magnitude_metrics.csv"
 OUTPUT_CSV = "lab2_classification.csv"
+SWEEP_CSV = "lab2_threshold_sweep.csv"
 
 # Thresholds (adjustable)
 SEMANTIC_THRESHOLD = 0.80
 TOKEN_THRESHOLD = 0.75
 
-df = pd.read_csv(INPUT_CSV)
+# Grid evaluated in one pass for calibration (every semantic x token pair); None skips the sweep
+SWEEP_SEMANTIC = np.round(np.arange(0.50, 1.0001, 0.01), 2)
+SWEEP_TOKEN = np.round(np.arange(0.00, 1.0001, 0.01), 2)
+
+
+def threshold_sweep(semantic, token, semantic_grid, token_grid):
+    """Confusion counts and agreement rate of the Minor/Major classes for every threshold pair.
+
+    Each row is binned once per axis (how many thresholds it clears), the 2-D
+    histogram of those bins is summed from the top right, and the count of
+    rows that are Minor for both at (s, t) is then a single lookup, so the
+    cost is one pass over the rows plus one over the grid. Missing
+    similarities count as Major, as in the classification itself.
+    """
+    s_grid = np.sort(np.asarray(semantic_grid, dtype=float))
+    t_grid = np.sort(np.asarray(token_grid, dtype=float))
+    sem = np.nan_to_num(np.asarray(semantic, dtype=float), nan=-np.inf)
+    tok = np.nan_to_num(np.asarray(token, dtype=float), nan=-np.inf)
+    # Row is Minor at grid threshold i exactly when i < its bin
+    s_bin = np.searchsorted(s_grid, sem, side="right")
+    t_bin = np.searchsorted(t_grid, tok, side="right")
+    shape = (len(s_grid) + 1, len(t_grid) + 1)
+    hist = np.bincount(s_bin * shape[1] + t_bin, minlength=shape[0] * shape[1]).reshape(shape)
+    at_least = hist[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]  # rows with bins >= (a, b)
+
+    both_minor = at_least[1:, 1:]
+    sem_minor = at_least[1:, :1]
+    tok_minor = at_least[:1, 1:]
+    n = len(sem)
+    minor_major = sem_minor - both_minor
+    major_minor = tok_minor - both_minor
+    both_major = n - both_minor - minor_major - major_minor
+    s_idx, t_idx = np.meshgrid(np.arange(len(s_grid)), np.arange(len(t_grid)), indexing="ij")
+    return pd.DataFrame({
+        "Semantic_Threshold": s_grid[s_idx.ravel()],
+        "Token_Threshold": t_grid[t_idx.ravel()],
+        "Minor_Minor": both_minor.ravel(),
+        "Minor_Major": minor_major.ravel(),   # semantic Minor, token Major
+        "Major_Minor": major_minor.ravel(),
+        "Major_Major": both_major.ravel(),
+        "Agreement_Rate": ((both_minor + both_major) / n if n else np.zeros_like(both_minor, float)).ravel(),
+    })
+
+
+df = read_table(INPUT_CSV)
 df.columns = df.columns.str.strip()
 
-df["Semantic_class"] = df["Semantic_Similarity"].apply(
-    lambda x: "Minor" if x >= SEMANTIC_THRESHOLD else "Major"
-)
+df["Semantic_class"] = np.where(df["Semantic_Similarity"] >= SEMANTIC_THRESHOLD, "Minor", "Major")
 
 # Token classification
-df["Token_class"] = df["Token_Similarity"].apply(
-    lambda x: "Minor" if x >= TOKEN_THRESHOLD else "Major"
-)
+df["Token_class"] = np.where(df["Token_Similarity"] >= TOKEN_THRESHOLD, "Minor", "Major")
 
 # Check agreement
-df["Classes_Agree"] = df.apply(
-    lambda row: "YES" if row["Semantic_class"] == row["Token_class"] else "NO", axis=1
-)
+df["Classes_Agree"] = np.where(df["Semantic_class"] == df["Token_class"], "YES", "NO")
 
-df.to_csv(OUTPUT_CSV, index=False)
+write_table(df, OUTPUT_CSV)
 print(f"Done! Classification saved to '{OUTPUT_CSV}'.")
 
+if SWEEP_SEMANTIC is not None and SWEEP_TOKEN is not None:
+    sweep = threshold_sweep(df["Semantic_Similarity"], df["Token_Similarity"], SWEEP_SEMANTIC, SWEEP_TOKEN)
+    write_table(sweep, SWEEP_CSV)
+    best = sweep.loc[sweep["Agreement_Rate"].idxmax()]
+    print(f"Threshold sweep over {len(sweep)} pairs saved to '{SWEEP_CSV}'; highest agreement "
+          f"{best['Agreement_Rate']:.1%} at semantic {best['Semantic_Threshold']:.2f} / "
+          f"token {best['Token_Threshold']:.2f}.")
@@ -1,4 +1,4 @@
-import pandas as pd
+from stage_io import read_table, write_table
 
 # ----------------------------
 # CONFIG
@@ -9,7 +9,7 @@ OUTPUT_CSV = "lab2_final_table.csv"
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-df = pd.read_csv(INPUT_CSV)
+df = read_table(INPUT_CSV)
 df.columns = df.columns.str.strip()
 
 # ----------------------------
@@ -35,6 +35,6 @@ final_columns = [col for col in final_columns if col in df.columns]
 final_df = df[final_columns]
 
 # Save final table
-final_df.to_csv(OUTPUT_CSV, index=False)
+write_table(final_df, OUTPUT_CSV)
 print(f"Final table saved to '{OUTPUT_CSV}'.")
 
@@ -0,0 +1,143 @@
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+from dataclasses import dataclass, field
+from graphlib import TopologicalSorter
+from typing import List
+
+import stage_io
+import cc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAB02 = os.path.join(HERE, "..", "lab-02")
+
+# ----------------------------
+# CONFIG
+# ----------------------------
+STATE_FILE = ".pipeline_state.json"  # fingerprint each stage last ran with
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str                                     # run as __main__, in this process
+    inputs: List[str]                               # files / directories the stage reads
+    outputs: List[str]                              # tables it writes (CSV paths; kept as Parquet here)
+    code: List[str] = field(default_factory=list)   # helper modules whose changes should rerun it
+    csv: bool = True                                # also write the outputs as CSV
+
+
+# Source-heavy intermediates stay Parquet only; the classification tables are
+# small and are the lab's deliverables, so they are written as CSV as well.
+STAGES = [
+    Stage("cc", "cc.py", [cc.INPUT_CSV, cc.INPUT_DATASET, cc.INPUT_BLOBS], [cc.OUTPUT_CSV],
+          code=["metrics_engine.py", "metrics_cache.py", "sqlite_cache.py", "stage_io.py",
+                os.path.join(LAB02, "corpus.py"), os.path.join(LAB02, "diff_parser.py")],
+          csv=False),
+    Stage("semantics", "semantics.py", [cc.OUTPUT_CSV], ["lab2_change_magnitude_metrics.csv"],
+          code=["fast_bleu.py", "minhash.py", "embedding_cache.py", "sqlite_cache.py", "vector_store.py",
+                "stage_io.py",
+                os.path.join(LAB02, "diff_parser.py"), os.path.join(LAB02, "model_server.py")],
+          csv=False),
+    Stage("parte", "parte.py", ["lab2_change_magnitude_metrics.csv"],
+          ["lab2_classification.csv", "lab2_threshold_sweep.csv"],
+          code=["stage_io.py"]),
+    Stage("partf", "partf.py", ["lab2_classification.csv"], ["lab2_final_table.csv"],
+          code=["stage_io.py"]),
+]
+
+
+# ----------------------------
+# FINGERPRINTS
+# ----------------------------
+def _stamp(path):
+    """Cheap identity of a file or directory tree: sizes and modification times, not contents."""
+    if os.path.isdir(path):
+        entries = []
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                st = os.stat(os.path.join(root, name))
+                entries.append((os.path.relpath(os.path.join(root, name), path), st.st_size, st.st_mtime_ns))
+        return sorted(entries)
+    if os.path.exists(path):
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    return None
+
+
+def _code_path(path):
+    return path if os.path.isabs(path) else os.path.join(HERE, path)
+
+
+def fingerprint(stage):
+    """Hash of the stage's code (contents) and its inputs (stamps of the CSV and Parquet copies)."""
+    h = hashlib.sha1()
+    for path in [stage.script] + stage.code:
+        with open(_code_path(path), "rb") as fh:
+            h.update(hashlib.sha1(fh.read()).digest())
+    for path in stage.inputs:
+        h.update(json.dumps([path, _stamp(path), _stamp(stage_io.columnar_path(path))]).encode())
+    h.update(json.dumps(stage.csv).encode())
+    return h.hexdigest()
+
+
+def outputs_present(stage):
+    return all(os.path.exists(stage_io.columnar_path(p)) and (not stage.csv or os.path.exists(p))
+               for p in stage.outputs)
+
+
+def stage_order(stages):
+    """Stages in dependency order: a stage runs after every stage producing one of its inputs."""
+    producer = {out: s.name for s in stages for out in s.outputs}
+    graph = {s.name: {producer[i] for i in s.inputs if i in producer} for s in stages}
+    by_name = {s.name: s for s in stages}
+    return [by_name[name] for name in TopologicalSorter(graph).static_order()]
+
+
+# ----------------------------
+# RUN
+# ----------------------------
+def run(stages, force=()):
+    state = {}
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding="utf-8") as fh:
+            state = json.load(fh)
+    order = stage_order(stages)
+    stage_io.PIPELINE = True
+    try:
+        for i, stage in enumerate(order):
+            fp = fingerprint(stage)
+            if stage.name not in force and state.get(stage.name) == fp and outputs_present(stage):
+                print(f"[{stage.name}] up to date, skipped")
+                continue
+            print(f"[{stage.name}] running {stage.script}")
+            start = time.perf_counter()
+            stage_io.CSV_COPIES = set(stage.outputs) if stage.csv else set()
+            # Only outputs a later stage reads are kept in memory for it
+            stage_io.HANDOFF_PATHS = {p for later in order[i + 1:] for p in later.inputs} & set(stage.outputs)
+            runpy.run_path(_code_path(stage.script), run_name="__main__")
+            print(f"[{stage.name}] done in {time.perf_counter() - start:.1f}s")
+            # Recorded only once the stage succeeded, so a failed stage reruns next time
+            state[stage.name] = fp
+            with open(STATE_FILE, "w", encoding="utf-8") as fh:
+                json.dump(state, fh, indent=2)
+    finally:
+        stage_io.HANDOFF.clear()
+        stage_io.HANDOFF_PATHS = set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the lab-03 stages, skipping the ones whose inputs are unchanged.")
+    parser.add_argument("--force", nargs="*", metavar="STAGE",
+                        help="rerun these stages (all of them when no name is given)")
+    args = parser.parse_args()
+    names = [s.name for s in STAGES]
+    force = set(names) if args.force == [] else set(args.force or ())
+    unknown = force - set(names)
+    if unknown:
+        sys.exit(f"unknown stage(s): {', '.join(sorted(unknown))}; stages are {', '.join(names)}")
+    run(STAGES, force)
@@ -1,85 +1,333 @@
-import pandas as pd
+import difflib
+import hashlib
+import os
+import sys
 import torch
-from transformers import AutoTokenizer, AutoModel
-from nltk.translate.bleu_score import sentence_bleu
+from transformers import AutoConfig, AutoTokenizer, AutoModel
 from tqdm import tqdm
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab-02"))
+from model_server import connect
+from blob_store import git_blob_sha
+from diff_parser import parse_diff
+from embedding_cache import EmbeddingCache
+from fast_bleu import bleu_batch
+from minhash import jaccard_estimates, lsh_candidates, minhash_signatures
+from vector_store import VectorStore
+from stage_io import read_table, write_table
+
 # ----------------------------
 # CONFIG
 # ----------------------------
 INPUT_CSV = "lab2_structural_metrics_first.csv"
 OUTPUT_CSV = "lab2_change_magnitude_metrics.csv"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+MODEL_NAME = "microsoft/codebert-base"
+MODEL_SOCKET = "/tmp/stt_models.sock"  # lab-02/model_server.py socket; used automatically when it exists
+MAX_LENGTH = 512       # tokens per window, special tokens included
+WINDOW_STRIDE = 384    # tokens between window starts; MAX_LENGTH - 2 - WINDOW_STRIDE tokens of overlap
+MAX_WINDOWS = 8        # per file; longer files get MAX_WINDOWS windows spread evenly over them
+EMBED_BATCH = 32       # windows per forward pass (padded to the longest in the batch)
+EMBED_GROUP = 256      # source versions tokenized, windowed and cached per step
+EMBEDDING_CACHE = "codebert_embeddings.sqlite"  # content hash -> vector, kept across runs; None disables
+FIX_VECTORS = "fix_vectors"  # "Hash:Filename" -> after-minus-before vector, for vector_store.py searches; None disables
+                             # (one sub-store per embedding setup and COMPARE mode, so vectors are never mixed)
+BLEU_BATCH = 1000      # (before, after) pairs scored per bleu_batch call
+
+# "file": compare the whole before/after files
+# "diff": compare only the changed lines of each version plus CONTEXT_LINES around them
+#         (from the input's Diff column when it has one, otherwise from difflib)
+COMPARE = "file"
+CONTEXT_LINES = 3
+
+# "model":  CodeBERT + BLEU similarities (the lab's metrics)
+# "approx": MinHash Jaccard estimate only, no model at all (cheap triage for very large corpora)
+# "both":   all three, plus a report of how well MinHash agrees with CodeBERT and BLEU
+SIMILARITY = "model"
+MINHASH_PERMS = 128
+SHINGLE_TOKENS = 4     # whitespace tokens per shingle
+LSH_BANDS = 16         # MinHash_Near flags pairs above Jaccard ~ (1/LSH_BANDS) ** (LSH_BANDS/MINHASH_PERMS)
+MINHASH_BATCH = 5000   # (before, after) pairs hashed per step
+MINHASH_THRESHOLD = 0.70  # "Minor" at or above, in the agreement report
+SEMANTIC_THRESHOLD = 0.80  # as in parte.py
+TOKEN_THRESHOLD = 0.75     # as in parte.py
 
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-df = pd.read_csv(INPUT_CSV)
+df = read_table(INPUT_CSV)
 df.columns = df.columns.str.strip()
 
 # ----------------------------
 # LOAD CODEBERT MODEL
 # ----------------------------
-tokenizer = AutoTokenizer.from_pretrained("microsoft/codebert-base")
-model = AutoModel.from_pretrained("microsoft/codebert-base")
-model.to(DEVICE)
-model.eval()
+# Windows are cut here, so the tokenizer is always local; a running model server
+# already holds CodeBERT, otherwise load it here
+if SIMILARITY != "approx":
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model_client = connect(MODEL_SOCKET)
+    if model_client is None:
+        model = AutoModel.from_pretrained(MODEL_NAME)
+        model.to(DEVICE)
+        model.eval()
 
 # ----------------------------
 # HELPER FUNCTIONS
 # ----------------------------
-def compute_semantic_similarity(code1, code2):
-    """Compute cosine similarity between CodeBERT embeddings."""
-    if not isinstance(code1, str):
-        code1 = ""
-    if not isinstance(code2, str):
-        code2 = ""
-    try:
-        inputs1 = tokenizer(code1, return_tensors="pt", truncation=True, max_length=512).to(DEVICE)
-        inputs2 = tokenizer(code2, return_tensors="pt", truncation=True, max_length=512).to(DEVICE)
-        with torch.no_grad():
-            emb1 = model(**inputs1).last_hidden_state.mean(dim=1)
-            emb2 = model(**inputs2).last_hidden_state.mean(dim=1)
-        cos_sim = torch.nn.functional.cosine_similarity(emb1, emb2).item()
-    except Exception:
-        cos_sim = 0.0
-    return cos_sim
-
-def compute_token_similarity(code1, code2):
-    """Compute BLEU score between two code strings."""
-    if not isinstance(code1, str):
-        code1 = ""
-    if not isinstance(code2, str):
-        code2 = ""
-    reference = [code1.split()]
-    candidate = code2.split()
-    try:
-        score = sentence_bleu(reference, candidate)
-    except Exception:
-        score = 0.0
-    return score
+def content_key(code):
+    return git_blob_sha(code.encode("utf-8", errors="surrogateescape"))
+
+def model_dim():
+    """Width of the CodeBERT vectors (hidden size), from the model config."""
+    return AutoConfig.from_pretrained(MODEL_NAME).hidden_size
+
+def token_windows(ids):
+    """Overlapping windows of at most MAX_LENGTH tokens (special tokens added) covering `ids`.
+
+    Files that fit get one window, the same input plain truncation gave. The
+    last window is aligned to the end of the file; past MAX_WINDOWS, windows
+    are picked evenly from start to end rather than keeping only the start.
+    """
+    size = MAX_LENGTH - tokenizer.num_special_tokens_to_add()
+    starts = list(range(0, max(len(ids) - size, 0) + 1, WINDOW_STRIDE))
+    if starts[-1] + size < len(ids):
+        starts.append(len(ids) - size)
+    if len(starts) > MAX_WINDOWS:
+        picks = np.linspace(0, len(starts) - 1, MAX_WINDOWS).round().astype(int)
+        starts = [starts[i] for i in picks]
+    return [tokenizer.build_inputs_with_special_tokens(ids[s:s + size]) for s in starts]
+
+def embed_batch(windows):
+    """Mean-pooled CodeBERT vectors (float32, one row per window) for one padded batch."""
+    if model_client is not None:
+        return model_client.embed_ids(MODEL_NAME, windows)
+    inputs = tokenizer.pad({"input_ids": windows}, return_tensors="pt").to(DEVICE)
+    with torch.no_grad():
+        hidden = model(**inputs).last_hidden_state
+    # Mean over real tokens only: the same vector each window gets when embedded on its own
+    mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    return ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().cpu().numpy()
+
+def embed_windows(windows):
+    """One vector (or None, if it could not be embedded) per window.
+
+    Windows are embedded EMBED_BATCH at a time, sorted by length so each batch
+    pads to similar sizes; a batch that fails is retried window by window.
+    """
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+    vectors = [None] * len(windows)
+    for i in range(0, len(order), EMBED_BATCH):
+        idx = order[i:i + EMBED_BATCH]
+        try:
+            for j, vec in zip(idx, embed_batch([windows[j] for j in idx])):
+                vectors[j] = vec
+        except Exception:
+            for j in idx:
+                try:
+                    vectors[j] = embed_batch([windows[j]])[0]
+                except Exception:
+                    pass
+    return vectors
+
+def embed_versions(codes, cache=None):
+    """{content hash: vector} for every distinct source version in `codes`.
+
+    Cached vectors are reused. The rest are tokenized in full, cut into
+    overlapping windows (token_windows), and the windows of EMBED_GROUP
+    versions are embedded together; a version's vector is the mean of its
+    window vectors, weighted by window length. Versions none of whose windows
+    could be embedded get no vector.
+    """
+    found = cache.get_many(codes) if cache is not None else {}
+    todo = sorted((k for k in codes if k not in found), key=lambda k: len(codes[k]))
+    for g in tqdm(range(0, len(todo), EMBED_GROUP), desc="Embedding source versions"):
+        keys = todo[g:g + EMBED_GROUP]
+        token_ids = tokenizer([codes[k] for k in keys], add_special_tokens=False, verbose=False)["input_ids"]
+        owners, windows = [], []
+        for key, ids in zip(keys, token_ids):
+            for window in token_windows(ids):
+                owners.append(key)
+                windows.append(window)
+        sums, weights = {}, {}
+        for key, window, vec in zip(owners, windows, embed_windows(windows)):
+            if vec is None:
+                continue
+            sums[key] = sums.get(key, 0) + vec * len(window)
+            weights[key] = weights.get(key, 0) + len(window)
+        vectors = {key: (sums[key] / weights[key]).astype(np.float32) for key in sums}
+        found.update(vectors)
+        if cache is not None and vectors:
+            cache.put_many(vectors)
+    return found
+
+def compute_semantic_similarities(before, after, cache=None, fix_store=None, row_ids=None):
+    """Cosine similarity between the CodeBERT embeddings of each (before, after) pair.
+
+    Identical pairs are 1.0 without a model call, every other distinct version
+    is embedded once (see embed_versions), and pairs with a missing vector
+    score 0.0. With a `fix_store`, each pair's change vector (after minus
+    before) is added to it under its `row_ids` entry.
+    """
+    before = [c if isinstance(c, str) else "" for c in before]
+    after = [c if isinstance(c, str) else "" for c in after]
+    keys_b = [content_key(c) for c in before]
+    keys_a = [content_key(c) for c in after]
+    codes = {}
+    for kb, ka, cb, ca in zip(keys_b, keys_a, before, after):
+        if kb != ka:
+            codes[kb] = cb
+            codes[ka] = ca
+    vectors = embed_versions(codes, cache)
+
+    sims = []
+    fix_ids, fix_vectors = [], []
+    for i, (kb, ka) in enumerate(zip(keys_b, keys_a)):
+        if kb == ka:
+            sims.append(1.0)
+            continue
+        emb1, emb2 = vectors.get(kb), vectors.get(ka)
+        if emb1 is None or emb2 is None:
+            sims.append(0.0)
+            continue
+        denom = np.linalg.norm(emb1) * np.linalg.norm(emb2)
+        sims.append(float(emb1 @ emb2 / denom) if denom else 0.0)
+        if fix_store is not None:
+            fix_ids.append(row_ids[i])
+            fix_vectors.append(emb2 - emb1)
+    if fix_ids:
+        fix_store.add(fix_ids, np.stack(fix_vectors))
+    return sims
+
+def _line_ranges(lines, context, n_lines):
+    """Merged 1-based (first, last) ranges covering `lines` plus `context` lines on each side."""
+    ranges = []
+    for ln in sorted(set(lines)):
+        lo, hi = max(1, ln - context), min(n_lines, ln + context)
+        if lo > hi:
+            continue
+        if ranges and lo <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], hi)
+        else:
+            ranges.append([lo, hi])
+    return ranges
+
+def changed_lines(before_lines, after_lines, diff=None):
+    """(old, new) line numbers the change touches, from the recorded diff or else from difflib."""
+    if isinstance(diff, str):
+        parsed = parse_diff(diff)
+        if parsed:
+            return parsed.changed_old_lines(), parsed.changed_new_lines()
+    old, new = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, before_lines, after_lines).get_opcodes():
+        if tag == "equal":
+            continue
+        # A pure insertion (deletion) marks the line it sits before in the other version
+        old.extend(range(i1 + 1, i2 + 1) or [i1 + 1])
+        new.extend(range(j1 + 1, j2 + 1) or [j1 + 1])
+    return old, new
+
+def diff_regions(before, after, diff=None):
+    """(before, after) cut down to the changed lines plus CONTEXT_LINES; unchanged pairs are kept whole."""
+    before = before if isinstance(before, str) else ""
+    after = after if isinstance(after, str) else ""
+    before_lines, after_lines = before.splitlines(), after.splitlines()
+    old, new = changed_lines(before_lines, after_lines, diff)
+    if not old and not new:
+        return before, after
+
+    def cut(src, lines):
+        return "\n".join("\n".join(src[lo - 1:hi]) for lo, hi in _line_ranges(lines, CONTEXT_LINES, len(src)))
+    return cut(before_lines, old), cut(after_lines, new)
+
+def compute_token_similarities(before, after):
+    """BLEU of each after version against its before version, on whitespace tokens.
+
+    Same scores as NLTK's sentence_bleu([before.split()], after.split()), but
+    BLEU_BATCH pairs at a time (see fast_bleu.bleu_batch).
+    """
+    before, after = list(before), list(after)
+    scores = []
+    for i in tqdm(range(0, len(before), BLEU_BATCH), desc="Computing Token Similarity"):
+        refs = [c.split() if isinstance(c, str) else [] for c in before[i:i + BLEU_BATCH]]
+        hyps = [c.split() if isinstance(c, str) else [] for c in after[i:i + BLEU_BATCH]]
+        scores.extend(bleu_batch(refs, hyps))
+    return scores
+
+def compute_minhash_similarities(before, after):
+    """(estimated Jaccard, LSH near-duplicate flag) per pair over SHINGLE_TOKENS-token shingles."""
+    before, after = list(before), list(after)
+    estimates, near = [], []
+    for i in tqdm(range(0, len(before), MINHASH_BATCH), desc="Computing MinHash Similarity"):
+        docs_b = [c.split() if isinstance(c, str) else [] for c in before[i:i + MINHASH_BATCH]]
+        docs_a = [c.split() if isinstance(c, str) else [] for c in after[i:i + MINHASH_BATCH]]
+        sig = minhash_signatures(docs_b + docs_a, MINHASH_PERMS, SHINGLE_TOKENS)
+        sig_b, sig_a = sig[:len(docs_b)], sig[len(docs_b):]
+        estimates.extend(jaccard_estimates(sig_b, sig_a).tolist())
+        near.extend(lsh_candidates(sig_b, sig_a, LSH_BANDS).tolist())
+    return estimates, near
+
+def report_agreement(df):
+    """How well the MinHash estimate tracks the CodeBERT and BLEU similarities on the same rows."""
+    approx = df["MinHash_Similarity"]
+    approx_minor = approx >= MINHASH_THRESHOLD
+    print(f"MinHash agreement over {len(df)} rows (Minor at MinHash >= {MINHASH_THRESHOLD}):")
+    for col, threshold in (("Semantic_Similarity", SEMANTIC_THRESHOLD), ("Token_Similarity", TOKEN_THRESHOLD)):
+        minor = df[col] >= threshold
+        print(f"  vs {col:20s} pearson {approx.corr(df[col]):6.3f}  spearman "
+              f"{approx.rank().corr(df[col].rank()):6.3f}  "
+              f"class agreement {(approx_minor == minor).mean():6.1%}  "
+              f"LSH flag agreement {(df['MinHash_Near'] == minor).mean():6.1%}")
 
 # ----------------------------
 # COMPUTE METRICS WITH PROGRESS
 # ----------------------------
-semantic_sims = []
-token_sims = []
+before_codes, after_codes = df["Source Code (before)"], df["Source Code (current)"]
+if COMPARE == "diff":
+    diffs = df["Diff"] if "Diff" in df.columns else [None] * len(df)
+    regions = [diff_regions(b, a, d) for b, a, d in tqdm(zip(before_codes, after_codes, diffs),
+                                                         total=len(df), desc="Extracting changed regions")]
+    before_codes = [b for b, _ in regions]
+    after_codes = [a for _, a in regions]
 
-for _, row in tqdm(df.iterrows(), total=len(df), desc="Computing Change Magnitude"):
-    code_before = row["Source Code (before)"]
-    code_after = row["Source Code (current)"]
-    
-    semantic_sims.append(compute_semantic_similarity(code_before, code_after))
-    token_sims.append(compute_token_similarity(code_before, code_after))
+if SIMILARITY != "approx":
+    embedding_key = f"{MODEL_NAME}|mean|{MAX_LENGTH}|windows:{WINDOW_STRIDE}x{MAX_WINDOWS}"
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE, embedding_key) if EMBEDDING_CACHE else None
+    # Change vectors go to a memory-mapped store: `python vector_store.py <store dir> <Hash:Filename>`
+    # lists the most similar past fixes without embedding anything again
+    fix_store = None
+    if FIX_VECTORS:
+        vector_key = f"{embedding_key}|compare:{COMPARE}" + (f"+{CONTEXT_LINES}" if COMPARE == "diff" else "")
+        fix_dir = os.path.join(FIX_VECTORS, f"{COMPARE}-{hashlib.sha1(vector_key.encode()).hexdigest()[:12]}")
+        fix_store = VectorStore(fix_dir, dim=None if os.path.exists(fix_dir) else model_dim(), key=vector_key)
+        print(f"Fix vectors: {fix_dir}")
+    row_ids = (df["Hash"].astype(str) + ":" + df["Filename"].astype(str)).tolist()
+    semantic_sims = compute_semantic_similarities(before_codes, after_codes, embedding_cache, fix_store, row_ids)
+    if embedding_cache is not None:
+        embedding_cache.close()
+    if fix_store is not None:
+        fix_store.close()
+
+    token_sims = compute_token_similarities(before_codes, after_codes)
+
+if SIMILARITY != "model":
+    minhash_sims, minhash_near = compute_minhash_similarities(before_codes, after_codes)
 
 # ----------------------------
 # ADD TO DATAFRAME
 # ----------------------------
-df["Semantic_Similarity"] = semantic_sims
-df["Token_Similarity"] = token_sims
+if SIMILARITY != "approx":
+    df["Semantic_Similarity"] = semantic_sims
+    df["Token_Similarity"] = token_sims
+if SIMILARITY != "model":
+    df["MinHash_Similarity"] = minhash_sims
+    df["MinHash_Near"] = minhash_near
+df["Similarity_Scope"] = COMPARE
+
+if SIMILARITY == "both":
+    report_agreement(df)
 
 # Save updated dataset
-df.to_csv(OUTPUT_CSV, index=False)
+write_table(df, OUTPUT_CSV)
 print(f"Done! Change magnitude metrics saved to '{OUTPUT_CSV}'.")
 
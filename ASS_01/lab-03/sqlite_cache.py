@@ -0,0 +1,78 @@
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class ContentCache(ABC):
+    """Persistent (content hash, namespace) -> value table in SQLite.
+
+    Rows are keyed by the source's blob SHA *and* a namespace naming what
+    produced the value (metrics engine, embedding model, ...), so changing how
+    values are computed never serves stale ones. WAL mode lets several runs
+    read while one writes. Subclasses name the table and its columns and
+    convert values to and from their column tuple; the storage is shared.
+    """
+
+    table: str
+    namespace_column: str
+    value_columns: List[Tuple[str, str]]   # (name, SQL type and constraints)
+    row_filter = ""                        # extra WHERE condition for rows that may be served
+
+    def __init__(self, path: str, namespace: str):
+        self.namespace = namespace
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = "".join(f" {name} {decl}," for name, decl in self.value_columns)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f" sha TEXT NOT NULL, {self.namespace_column} TEXT NOT NULL,{columns}"
+            f" PRIMARY KEY (sha, {self.namespace_column}))"
+        )
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """Bring a table written by an older version up to the current columns."""
+
+    @abstractmethod
+    def _encode(self, value) -> Tuple:
+        """The value as a tuple matching value_columns."""
+
+    @abstractmethod
+    def _decode(self, row: Tuple) -> Any:
+        """The value stored as `row` (value_columns order)."""
+
+    def get_many(self, shas: Iterable[str]) -> Dict[str, Any]:
+        shas = list(shas)
+        names = ", ".join(name for name, _ in self.value_columns)
+        extra = f" AND {self.row_filter}" if self.row_filter else ""
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(shas), 500):
+            part = shas[i:i + 500]
+            marks = ",".join("?" * len(part))
+            cur = self.conn.execute(
+                f"SELECT sha, {names} FROM {self.table}"
+                f" WHERE {self.namespace_column} = ?{extra} AND sha IN ({marks})",
+                [self.namespace] + part,
+            )
+            for sha, *values in cur:
+                found[sha] = self._decode(tuple(values))
+        return found
+
+    def put_many(self, items: Dict[str, Any]):
+        names = ", ".join(name for name, _ in self.value_columns)
+        marks = ", ".join("?" * (len(self.value_columns) + 2))
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (sha, {self.namespace_column}, {names}) VALUES ({marks})",
+            [(sha, self.namespace) + tuple(self._encode(value)) for sha, value in items.items()],
+        )
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE {self.namespace_column} = ?", [self.namespace]
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
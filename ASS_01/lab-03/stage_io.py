@@ -0,0 +1,110 @@
+import os
+
+import pandas as pd
+
+# Run on their own, the stage scripts read and write CSV exactly as before.
+# pipeline.py sets PIPELINE: tables are then saved as Parquet next to their CSV
+# path (x.csv -> x.parquet), and only the paths in CSV_COPIES are also written
+# as CSV. Tables up to HANDOFF_MAX_MB that a later stage reads (HANDOFF_PATHS)
+# also go to it in memory (HANDOFF); each is dropped as soon as it is read.
+PIPELINE = False
+CSV_COPIES = set()
+HANDOFF_PATHS = set()
+HANDOFF = {}
+HANDOFF_MAX_MB = 256
+
+
+def columnar_path(path):
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def _parquet_is_current(path):
+    parquet = columnar_path(path)
+    if not os.path.exists(parquet):
+        return False
+    return not os.path.exists(path) or os.path.getmtime(parquet) >= os.path.getmtime(path)
+
+
+def read_table(path, columns=None):
+    """The table at `path`: handed over in memory, else its Parquet copy when current, else the CSV."""
+    if path in HANDOFF:
+        df = HANDOFF.pop(path)
+        return df[columns] if columns else df
+    if _parquet_is_current(path):
+        return pd.read_parquet(columnar_path(path), columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_table(df, path):
+    if not PIPELINE:
+        df.to_csv(path, index=False)
+        return
+    df.to_parquet(columnar_path(path), index=False)
+    if path in CSV_COPIES:
+        df.to_csv(path, index=False)
+    if path in HANDOFF_PATHS and df.memory_usage(deep=True).sum() <= HANDOFF_MAX_MB * 1024 * 1024:
+        HANDOFF[path] = df
+
+
+class TableWriter:
+    """Batch-by-batch write_table: every append goes straight to disk, so no batch is held.
+
+    In the pipeline, batches stream into one Parquet file (written under a
+    temporary name and renamed on close, so a failed stage never leaves a
+    partial table that looks current). Columns named in `dtypes` are cast
+    before every write; the schema comes from the first non-empty batch, with
+    its all-null columns taken as strings, and a later batch that does not fit
+    it is an error rather than a silently different file.
+    """
+
+    def __init__(self, path, dtypes=None):
+        self.path = path
+        self.dtypes = dtypes or {}
+        self.rows = 0
+        self._parquet = None
+        self._schema = None
+        self._empty = None   # columns of an empty batch, written on close if nothing else came
+
+    def append(self, df):
+        if self.dtypes:
+            df = df.astype({col: t for col, t in self.dtypes.items() if col in df.columns})
+        if PIPELINE:
+            self._append_parquet(df)
+        if not PIPELINE or self.path in CSV_COPIES:
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def _append_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet is None:
+            if df.empty:
+                self._empty = df
+                return
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            self._schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                      for f in schema])
+            self._parquet = pq.ParquetWriter(columnar_path(self.path) + ".partial", self._schema)
+        try:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise TypeError(f"{self.path}: batch at row {self.rows} does not match the schema "
+                            f"of the first batch (declare the column in dtypes): {e}") from e
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+            os.replace(columnar_path(self.path) + ".partial", columnar_path(self.path))
+        elif self._empty is not None:
+            self._empty.to_parquet(columnar_path(self.path), index=False)
+        self._empty = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,94 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class HeavyHitters:
+    """Misra-Gries frequent-items summary, updated a whole chunk of counts at a time.
+
+    At most `capacity` items are kept. When a chunk pushes the table past
+    that, the (capacity + 1)-th largest count is subtracted from every entry
+    and non-positive ones are dropped; `error` adds up those subtractions, so
+    each kept count is low by at most `error`, and any item seen more than
+    total / (capacity + 1) times is always kept. While `error` is 0 the
+    counts are exact.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.total = 0
+        self.error = 0
+
+    def update(self, values: pd.Series):
+        self.update_counts(values.value_counts())
+
+    def update_counts(self, counts: pd.Series):
+        """Add pre-aggregated counts (item -> occurrences) from one chunk."""
+        if counts.empty:
+            return
+        self.total += int(counts.sum())
+        merged = self.counts.add(counts, fill_value=0).astype(np.int64)
+        if len(merged) > self.capacity:
+            cut = int(merged.nlargest(self.capacity + 1).iloc[-1])
+            merged = merged[merged > cut] - cut
+            self.error += cut
+        self.counts = merged
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def top(self, n: Optional[int] = None) -> pd.Series:
+        """The n most frequent items (all kept items when n is None), most frequent first."""
+        ranked = self.counts.sort_values(ascending=False, kind="stable")
+        return ranked if n is None else ranked.head(n)
+
+
+class DistinctCounter:
+    """Number of distinct values: exact up to `exact_limit`, then a HyperLogLog estimate.
+
+    Values are reduced to pandas' stable 64-bit hashes. Below the limit the
+    sorted unique hashes are kept (8 bytes per value); past it only the 2**p
+    HyperLogLog registers remain, which estimate within about
+    1.04 / sqrt(2**p) (0.8% for p = 14) whatever the input size.
+    """
+
+    def __init__(self, exact_limit: int = 1_000_000, p: int = 14):
+        self.exact_limit = exact_limit
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+        self._seen: Optional[np.ndarray] = np.zeros(0, dtype=np.uint64)
+
+    def update(self, values: pd.Series):
+        values = values.dropna()
+        if values.empty:
+            return
+        h = pd.util.hash_array(values.to_numpy(dtype=object))
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h << np.uint64(self.p)
+        # rho = position of the first 1 bit of the remaining hash bits; the top
+        # 53 bits are converted to float exactly and frexp gives their bit length
+        _, bits = np.frexp((rest >> np.uint64(11)).astype(np.float64))
+        rho = np.where(bits > 0, 54 - bits, 65 - self.p).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+        if self._seen is not None:
+            self._seen = np.union1d(self._seen, h)
+            if len(self._seen) > self.exact_limit:
+                self._seen = None
+
+    @property
+    def exact(self) -> bool:
+        return self._seen is not None
+
+    def count(self) -> int:
+        if self._seen is not None:
+            return len(self._seen)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)   # small-range (linear counting) correction
+        return int(round(estimate))
@@ -0,0 +1,176 @@
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class VectorStore:
+    """Append-only float32 matrix on disk with a string id per row, searched through np.memmap.
+
+    `<root>/vectors.f32` holds the rows back to back (dim float32 each) and
+    `<root>/ids.txt` the id of each row, one per line in row order; the
+    dimension, and the optional `key` naming what produced the vectors, are in
+    `<root>/meta.json`; opening a store with a different key is an error, so
+    incompatible embeddings never share an index. Rows are L2-normalised when
+    added, so a dot product is a cosine similarity. Search is exact: the
+    matrix is scanned in blocks of `block_rows`, one matrix multiply per block
+    against all the queries, keeping a running top-k, so memory stays bounded
+    whatever the store's size.
+    """
+
+    def __init__(self, root: str, dim: Optional[int] = None, key: Optional[str] = None):
+        self.root = root
+        self.key = key
+        self.vectors_path = os.path.join(root, "vectors.f32")
+        self.ids_path = os.path.join(root, "ids.txt")
+        self.meta_path = os.path.join(root, "meta.json")
+        self.dim = dim
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vec = None
+        self._idf = None
+        self._map: Optional[np.memmap] = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            if self.dim is None:
+                raise FileNotFoundError(f"no vector store at {self.root}; pass dim to create one")
+            return
+        with open(self.meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if self.key is not None and meta.get("key") != self.key:
+            raise ValueError(f"{self.root} holds vectors for {meta.get('key')!r}, not {self.key!r}")
+        self.key = meta.get("key")
+        stored = meta["dim"]
+        if self.dim is not None and self.dim != stored:
+            raise ValueError(f"{self.root} holds {stored}-dimensional vectors, not {self.dim}")
+        self.dim = stored
+        rows_on_disk = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, encoding="utf-8") as fh:
+                for line in fh:
+                    # Ids whose vector never made it to disk (crash mid-write) are dropped
+                    if len(self._ids) >= rows_on_disk or not line.endswith("\n"):
+                        break
+                    self._rows[line[:-1]] = len(self._ids)
+                    self._ids.append(line[:-1])
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _open_for_append(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.meta_path, "w", encoding="utf-8") as fh:
+            json.dump({"dim": self.dim, "key": self.key}, fh)
+        self._vec = open(self.vectors_path, "a+b")
+        # Drop a torn tail so rows and ids line up again
+        self._vec.truncate(len(self._ids) * 4 * self.dim)
+        self._vec.seek(0, os.SEEK_END)
+        with open(self.ids_path, "w", encoding="utf-8") as fh:
+            fh.writelines(f"{key}\n" for key in self._ids)
+        self._idf = open(self.ids_path, "a", encoding="utf-8")
+
+    def add(self, ids: Sequence[str], vectors) -> int:
+        """Append the vectors whose id is not stored yet; returns how many were added.
+
+        Zero vectors cannot be normalised and are skipped. Ids must not contain
+        newlines.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+        norms = np.linalg.norm(vectors, axis=1)
+        keep, seen = [], set()
+        for i, key in enumerate(ids):
+            if key not in self._rows and key not in seen and norms[i] > 0:
+                seen.add(key)
+                keep.append(i)
+        if not keep:
+            return 0
+        if self._vec is None:
+            self._open_for_append()
+        for i in keep:
+            self._rows[ids[i]] = len(self._ids)
+            self._ids.append(ids[i])
+        self._vec.write((vectors[keep] / norms[keep, None]).astype(np.float32).tobytes())
+        self._idf.writelines(f"{ids[i]}\n" for i in keep)
+        return len(keep)
+
+    def sync(self):
+        if self._vec is None:
+            return
+        self._vec.flush()
+        os.fsync(self._vec.fileno())
+        self._idf.flush()
+        os.fsync(self._idf.fileno())
+
+    def matrix(self) -> np.ndarray:
+        """All rows as a read-only (len, dim) memmap."""
+        if self._map is None or len(self._map) != len(self._ids):
+            if self._vec is not None:
+                self._vec.flush()
+            if not self._ids:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._map = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self._ids), self.dim))
+        return self._map
+
+    def get(self, key: str) -> np.ndarray:
+        return np.array(self.matrix()[self._rows[key]])
+
+    def search(self, queries, k: int = 10, block_rows: int = 65536) -> List[List[Tuple[str, float]]]:
+        """The k most cosine-similar stored rows for each query vector, best first."""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms > 0, norms, 1)
+        mat = self.matrix()
+        best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(q), 0), dtype=np.int64)
+        for start in range(0, len(mat), block_rows):
+            scores = q @ np.asarray(mat[start:start + block_rows]).T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append([(self._ids[r], float(s)) for r, s in zip(rows[order], scores[order])])
+        return results
+
+    def similar_to(self, key: str, k: int = 10) -> List[Tuple[str, float]]:
+        """The k stored rows most similar to the stored row `key`, without re-embedding anything."""
+        hits = self.search(self.get(key), k + 1)[0]
+        return [hit for hit in hits if hit[0] != key][:k]
+
+    def close(self):
+        self.sync()
+        if self._vec is not None:
+            self._vec.close()
+            self._idf.close()
+            self._vec = self._idf = None
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    # python vector_store.py <store dir> <stored id> [k]   -> the k stored rows most similar to that one
+    store = VectorStore(sys.argv[1])
+    target = sys.argv[2]
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    for key, score in store.similar_to(target, k):
+        print(f"{score:.4f}  {key}")
@@ -1,5 +1,12 @@
 # python script
+import os
+import shutil
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+from git import NULL_TREE, Repo
 from pydriller import Repository
+from pydriller.domain.commit import ModifiedFile
 import pandas as pd
 
 repo_list = [
@@ -8,44 +15,117 @@ repo_list = [
     "https://github.com/aardappel/lobster"
 ]
 
-# 1) Pre-pass: collect histogram diffs for (repo, commit, paths)
-hist_map = {}
-for i in repo_list:
-    print(f"[INFO] Starting histogram diff collection for {i}...")
-    commit_count = 0
-    for commit in Repository(i, skip_whitespaces=True, histogram_diff=True).traverse_commits():
-        if commit_count >= 500:
-            break
-        for m in commit.modified_files:
-            key = (i, commit.hash, m.old_path, m.new_path)
-            hist_map[key] = m.diff
-        commit_count += 1
-    print(f"[DONE] Histogram diff collection completed for {i} ({commit_count} commits).")
-
-# 2) Your original pass (Myers is the default)
-rows = []
-for i in repo_list:
-    print(f"[INFO] Starting Myers diff collection for {i}...")
-    commit_count = 0
-    for commit in Repository(i, skip_whitespaces=True).traverse_commits():
-        if commit_count >= 500:
-            break
+# ----------------------------
+# CONFIG
+# ----------------------------
+MAX_COMMITS = 500            # first commits of each repository, in traversal order
+COMMITS_PER_TASK = 100       # commit range handed to one worker; each range is one output partition
+PROCESSES = cpu_count()
+FLUSH_ROWS = 200             # rows a worker buffers before appending them to its partition
+CLONE_DIR = "repos"          # repositories are cloned once here and shared by the workers
+PARTS_DIR = "commits_data_parts"   # <repo>/part-NNNNN.csv; finished parts are kept, so a rerun resumes
+                                   # (clear it after changing MAX_COMMITS or COMMITS_PER_TASK)
+output_file = "/home/student/Desktop/commits_data.csv"   # all partitions joined, in repo/commit order
+
+COLUMNS = ["old_path", "new_path", "commit_SHA", "parent_SHA", "commit_message", "diff_meyers", "diff_histogram"]
+
+
+def histogram_diffs(commit):
+    """Histogram diffs of `commit` keyed by (old_path, new_path).
+
+    Same parent/child trees and options as pydriller's own (Myers) diff of the
+    commit, using the git objects it already loaded: no second traversal.
+    """
+    c = commit._c_object
+    options = {"histogram": True, "w": True}  # w = skip_whitespaces, as in the traversal
+    if len(c.parents) == 1:
+        diff_index = c.parents[0].diff(other=c, paths=None, create_patch=True, **options)
+    elif len(c.parents) > 1:
+        diff_index = []  # pydriller reports no modified files for merge commits
+    else:
+        diff_index = c.diff(NULL_TREE, paths=None, create_patch=True, **options)
+    return {(m.old_path, m.new_path): m.diff for m in (ModifiedFile(diff=d) for d in diff_index)}
+
+
+def repo_name(url):
+    return url.rstrip("/").split("/")[-1].removesuffix(".git")
+
+
+def plan_repo(url):
+    """Clone `url` (unless already cloned) and list its first MAX_COMMITS commits, in traversal order."""
+    path = os.path.join(CLONE_DIR, repo_name(url))
+    if not os.path.isdir(path):
+        print(f"[INFO] Cloning {url}...")
+        Repo.clone_from(url, path)
+    hashes = [c.hash for c in islice(Repository(path).traverse_commits(), MAX_COMMITS)]
+    return url, path, hashes
+
+
+def collect_range(task):
+    """Diff one commit range with Myers and histogram, streaming rows to the range's partition file."""
+    path, hashes, part = task
+    tmp = part + ".partial"
+    pd.DataFrame(columns=COLUMNS).to_csv(tmp, index=False, encoding="utf-8")
+    rows, n_rows = [], 0
+    for commit in Repository(path, skip_whitespaces=True, only_commits=hashes).traverse_commits():
+        hist = histogram_diffs(commit)
         for m in commit.modified_files:
-            key = (i, commit.hash, m.old_path, m.new_path)
-            row = {
+            rows.append({
                 "old_path": m.old_path,
                 "new_path": m.new_path,
                 "commit_SHA": commit.hash,
                 "parent_SHA": commit.parents[0] if len(commit.parents) > 0 else None,
                 "commit_message": commit.msg,
                 "diff_meyers": m.diff,
-                "diff_histogram": hist_map.get(key)
-            }
-            rows.append(row)
-        commit_count += 1
-    print(f"[DONE] Myers diff collection completed for {i} ({commit_count} commits).")
-
-df = pd.DataFrame(rows)
-output_file = "/home/student/Desktop/commits_data.csv"
-df.to_csv(output_file, index=False, encoding="utf-8")
-print(f"[SUCCESS] Data written to {output_file}")
+                "diff_histogram": hist.get((m.old_path, m.new_path))
+            })
+        if len(rows) >= FLUSH_ROWS:
+            pd.DataFrame(rows, columns=COLUMNS).to_csv(tmp, mode="a", header=False, index=False, encoding="utf-8")
+            n_rows += len(rows)
+            rows = []
+    if rows:
+        pd.DataFrame(rows, columns=COLUMNS).to_csv(tmp, mode="a", header=False, index=False, encoding="utf-8")
+        n_rows += len(rows)
+    # Only a complete range gets its final name, so an interrupted one is redone on rerun
+    os.replace(tmp, part)
+    return part, n_rows
+
+
+def combine(parts, target):
+    """Concatenate the partition CSVs into one, keeping a single header; copied in blocks, never loaded."""
+    with open(target, "wb") as out:
+        for n, part in enumerate(parts):
+            with open(part, "rb") as fh:
+                header = fh.readline()
+                if n == 0:
+                    out.write(header)
+                shutil.copyfileobj(fh, out)
+
+
+def main():
+    os.makedirs(CLONE_DIR, exist_ok=True)
+    with Pool(PROCESSES) as pool:
+        # 1) Clone and list commits, one repository per worker
+        plans = pool.map(plan_repo, repo_list)
+
+        # 2) Split every repository into commit ranges and diff them all in parallel
+        parts, tasks = [], []
+        for url, path, hashes in plans:
+            os.makedirs(os.path.join(PARTS_DIR, repo_name(url)), exist_ok=True)
+            for start in range(0, len(hashes), COMMITS_PER_TASK):
+                part = os.path.join(PARTS_DIR, repo_name(url), f"part-{start // COMMITS_PER_TASK:05d}.csv")
+                parts.append(part)
+                if not os.path.exists(part):
+                    tasks.append((path, hashes[start:start + COMMITS_PER_TASK], part))
+            print(f"[INFO] {url}: {len(hashes)} commits in {-(-len(hashes) // COMMITS_PER_TASK)} ranges.")
+        print(f"[INFO] Diffing {len(tasks)} commit ranges ({len(parts) - len(tasks)} already done) "
+              f"on {PROCESSES} processes...")
+        for part, n_rows in pool.imap_unordered(collect_range, tasks):
+            print(f"[DONE] {part} ({n_rows} rows).")
+
+    combine(parts, output_file)
+    print(f"[SUCCESS] Data written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()